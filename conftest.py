@@ -0,0 +1,10 @@
+import pytest
+
+from posts.testing import isolated_storage as _isolated_storage
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_storage():
+    """То же, что TEST_RUNNER делает для manage.py test."""
+    with _isolated_storage():
+        yield
@@ -1,9 +1,22 @@
 from django.contrib import admin
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.html import format_html
 
-from .models import Comment, Follow, Group, Post
+from . import search
+from .models import Comment, Follow, Group, Post, RequestProfile, Task
 
 
-class PostAdmin(admin.ModelAdmin):
+class FullTextSearchMixin:
+    """Поиск в админке через индекс FTS5 вместо LIKE '%...%'."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.filter_queryset(queryset, search_term), False
+
+
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ("pk", "text", "pub_date", "author", "group")
     search_fields = ("text",)
     list_filter = ("pub_date",)
@@ -20,7 +33,7 @@ class GroupAdmin(admin.ModelAdmin):
 admin.site.register(Group, GroupAdmin)
 
 
-class CommentAdmin(admin.ModelAdmin):  
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):  
     list_display = ('post', 'author', 'text', 'created')  
     list_filter = ('created',)  
     search_fields = ('author', 'text')
@@ -32,3 +45,66 @@ class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')  
 
 admin.site.register(Follow, FollowAdmin)
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'created', 'method', 'path', 'view_name', 'status', 'duration',
+        'query_count', 'sql_time', 'trigger', 'user',
+    )
+    list_filter = ('trigger', 'view_name', 'created')
+    search_fields = ('path',)
+    exclude = ('stats', 'summary', 'sql')
+    readonly_fields = (
+        'created', 'method', 'path', 'view_name', 'user', 'trigger',
+        'status', 'duration', 'query_count', 'sql_time', 'profile', 'queries',
+    )
+    actions = ['download_stats']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def profile(self, obj):
+        return format_html('<pre>{}</pre>', obj.summary)
+
+    def queries(self, obj):
+        return format_html('<pre>{}</pre>', obj.sql)
+
+    def download_stats(self, request, queryset):
+        """Файл .prof для snakeviz или pstats, по первому выбранному."""
+        obj = queryset.first()
+        response = HttpResponse(
+            bytes(obj.stats), content_type='application/octet-stream'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="profile-{obj.pk}.prof"'
+        )
+        return response
+    download_stats.short_description = 'Скачать .prof'
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'name', 'status', 'run_at', 'attempts', 'max_attempts',
+        'locked_by', 'finished',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('locked_by', 'locked_at', 'finished', 'created')
+    actions = ['retry']
+
+    def retry(self, request, queryset):
+        """Ставит выбранные упавшие задачи в очередь заново."""
+        updated = queryset.filter(status=Task.FAILED).update(
+            status=Task.QUEUED, run_at=timezone.now(), attempts=0,
+            finished=None,
+        )
+        self.message_user(request, f'Поставлено в очередь: {updated}')
+    retry.short_description = 'Повторить'
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,21 @@
+def percentile(values, fraction):
+    """Значение, ниже которого лежит доля fraction отсортированных values."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Сводка замеров в миллисекундах для машинного сравнения."""
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(
+            sum(latencies) / len(latencies) * 1000 if latencies else 0, 3
+        ),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0,
+    }
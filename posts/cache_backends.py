@@ -0,0 +1,358 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+from .kvstore import LRUCache
+
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE TABLE IF NOT EXISTS invalidations ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, '
+    'origin INTEGER NOT NULL, created REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE INDEX IF NOT EXISTS invalidations_created '
+    'ON invalidations (created)',
+)
+CLEAR_ALL = '*'
+
+
+class _ProcessTier:
+    """Общий для всех потоков процесса LRU и позиция в журнале сообщений."""
+
+    def __init__(self, max_entries, timeout):
+        self.lru = LRUCache(max_entries, timeout)
+        self.lock = threading.Lock()
+        self.last_seen = None
+        self.last_sync = 0.0
+        self.writes = 0
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+def _process_tier(location, max_entries, timeout):
+    # ключ с pid: после fork у процесса свой LRU и своя позиция в журнале
+    key = (location, os.getpid())
+    with _tiers_lock:
+        if key not in _tiers:
+            _tiers[key] = _ProcessTier(max_entries, timeout)
+        return _tiers[key]
+
+
+class TwoTierCache(BaseCache):
+    """Кэш из двух уровней: LRU в памяти процесса и общий файл SQLite.
+
+    Чтение сначала идёт в LRU, промах — в SQLite, общий для всех
+    процессов на машине. Каждая запись добавляет ключ в журнал
+    invalidations; процессы не реже раза в SYNC_INTERVAL секунд читают
+    из журнала чужие сообщения и выбрасывают эти ключи из своего LRU.
+    Записи в LRU живут не дольше LOCAL_TIMEOUT, что ограничивает
+    рассогласование, даже если сообщение потерялось при чистке журнала.
+    Просроченные записи и старые сообщения журнала удаляются раз в
+    CLEANUP_EVERY записей процесса, а не при каждой.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._local_max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self._sync_interval = options.get('SYNC_INTERVAL', 0.05)
+        self._journal_ttl = options.get('JOURNAL_TTL', 60)
+        self._cleanup_every = options.get('CLEANUP_EVERY', 100)
+        self._connection = None
+        self._pid = None
+
+    @property
+    def _tier(self):
+        return _process_tier(
+            self._path, self._local_max_entries, self._local_timeout
+        )
+
+    def _db(self):
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    # общий уровень и журнал
+
+    def _sync(self):
+        tier = self._tier
+        now = time.monotonic()
+        if (tier.last_seen is not None
+                and now - tier.last_sync < self._sync_interval):
+            return
+        with tier.lock:
+            tier.last_sync = now
+            db = self._db()
+            if tier.last_seen is None:
+                # первое обращение процесса: LRU пуст, старые сообщения
+                # ему не нужны
+                tier.last_seen = db.execute(
+                    'SELECT COALESCE(MAX(id), 0) FROM invalidations'
+                ).fetchone()[0]
+                return
+            rows = db.execute(
+                'SELECT id, key, origin FROM invalidations WHERE id > ? '
+                'ORDER BY id',
+                (tier.last_seen,),
+            ).fetchall()
+            for row_id, key, origin in rows:
+                tier.last_seen = row_id
+                if origin == os.getpid():
+                    continue
+                if key == CLEAR_ALL:
+                    tier.lru.clear()
+                else:
+                    tier.lru.delete(key)
+
+    def _publish(self, db, keys):
+        now = time.time()
+        db.executemany(
+            'INSERT INTO invalidations (key, origin, created) '
+            'VALUES (?, ?, ?)',
+            [(key, os.getpid(), now) for key in keys],
+        )
+
+    def _write(self, items, only_new=False):
+        """Записывает {key: (value, expires)} и оповещает другие процессы."""
+        db = self._db()
+        now = time.time()
+        written = []
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            for key, (data, expires) in items.items():
+                if only_new:
+                    row = db.execute(
+                        'SELECT expires FROM cache WHERE key = ?', (key,)
+                    ).fetchone()
+                    if row is not None and (row[0] is None or row[0] > now):
+                        continue
+                db.execute(
+                    'INSERT OR REPLACE INTO cache (key, value, expires) '
+                    'VALUES (?, ?, ?)',
+                    (key, data, expires),
+                )
+                written.append(key)
+            if written:
+                self._publish(db, written)
+            if self._cleanup_due():
+                self._cleanup(db, now)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        for key in written:
+            self._remember(key, *items[key])
+        return written
+
+    def _cleanup_due(self):
+        tier = self._tier
+        with tier.lock:
+            tier.writes += 1
+            if tier.writes < self._cleanup_every:
+                return False
+            tier.writes = 0
+            return True
+
+    def _cleanup(self, db, now):
+        db.execute(
+            'DELETE FROM invalidations WHERE created < ?',
+            (now - self._journal_ttl,),
+        )
+        db.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires < ?',
+            (now,),
+        )
+        total = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if total > self._max_entries:
+            db.execute(
+                'DELETE FROM cache WHERE rowid IN ('
+                'SELECT rowid FROM cache ORDER BY rowid LIMIT ?)',
+                (total // self._cull_frequency or 1,),
+            )
+
+    def _remember(self, key, data, expires):
+        # позиция в журнале должна появиться раньше первой записи в LRU
+        self._sync()
+        if expires is None or expires > time.time():
+            self._tier.lru.set(key, (data, expires))
+
+    def _local_get(self, key):
+        item = self._tier.lru.get(key)
+        if item is None:
+            return None
+        data, expires = item
+        if expires is not None and expires <= time.time():
+            self._tier.lru.delete(key)
+            return None
+        return data
+
+    def _fetch(self, keys):
+        self._sync()
+        found = {}
+        missing = []
+        for key in keys:
+            data = self._local_get(key)
+            if data is None:
+                missing.append(key)
+            else:
+                found[key] = data
+        if missing:
+            now = time.time()
+            placeholders = ', '.join('?' * len(missing))
+            rows = self._db().execute(
+                f'SELECT key, value, expires FROM cache '
+                f'WHERE key IN ({placeholders})',
+                missing,
+            ).fetchall()
+            for key, data, expires in rows:
+                if expires is None or expires > now:
+                    found[key] = data
+                    self._remember(key, data, expires)
+        metrics.record_cache(len(found), len(keys) - len(found))
+        return found
+
+    # API кэша Django
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return bool(self._write(
+            {key: (data, self._expires(timeout))}, only_new=True
+        ))
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = self._fetch([key]).get(key)
+        if data is None:
+            return default
+        return pickle.loads(data)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        found = self._fetch(list(made))
+        return {made[key]: pickle.loads(data) for key, data in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._write({key: (data, self._expires(timeout))})
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        items = {}
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            items[key] = (pickled, expires)
+        self._write(items)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = self._fetch([key]).get(key)
+        if data is None:
+            return False
+        self._write({key: (data, self._expires(timeout))})
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        db = self._db()
+        now = time.time()
+        # чтение и запись под одной блокировкой файла: атомарно для
+        # всех процессов
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?', (data, key)
+            )
+            self._publish(db, [key])
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._remember(key, data, row[1])
+        return value
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+            self._tier.lru.delete(key)
+        if not keys:
+            return
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(
+                'DELETE FROM cache WHERE key = ?', [(key,) for key in keys]
+            )
+            self._publish(db, keys)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key in self._fetch([key])
+
+    def clear(self):
+        self._tier.lru.clear()
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute('DELETE FROM cache')
+            self._publish(db, [CLEAR_ALL])
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def close(self, **kwargs):
+        # соединение живёт дольше запроса, как и у файлового кэша
+        pass
@@ -0,0 +1,91 @@
+import time
+
+from django.core.cache import cache
+
+
+VERSION_KEY = 'version:{}'
+
+
+def scope_for_index():
+    return 'index'
+
+
+def scope_for_group(group_id):
+    return f'group:{group_id}'
+
+
+def scope_for_profile(user_id):
+    return f'profile:{user_id}'
+
+
+def scope_for_post(post_id):
+    return f'post:{post_id}'
+
+
+def scope_for_timeline(user_id):
+    return f'timeline:{user_id}'
+
+
+def _fresh_version():
+    # версия, потерянная вместе с кэшем, начинается с нового числа и не
+    # совпадает со старыми: иначе ETag старой страницы снова стал бы верным
+    return int(time.time() * 1000)
+
+
+def get_version(scope):
+    """Текущая версия области кэша; входит в ключи её фрагментов."""
+    return cache.get_or_set(VERSION_KEY.format(scope), _fresh_version, None)
+
+
+def get_versions(*scopes):
+    """Версии нескольких областей за одно обращение к кэшу."""
+    keys = {scope: VERSION_KEY.format(scope) for scope in scopes}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for scope, key in keys.items():
+        if key not in found:
+            found[key] = _fresh_version()
+            cache.add(key, found[key], None)
+        versions[scope] = found[key]
+    return versions
+
+
+def bump(*scopes):
+    """Инвалидирует фрагменты областей, увеличивая их версии.
+
+    Старые ключи не удаляются, а просто перестают запрашиваться
+    и вытесняются бэкендом по таймауту.
+    """
+    for scope in set(scopes):
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), None)
+
+
+def post_scopes(post, group_ids=()):
+    """Области, в которых показывается карточка поста."""
+    scopes = [
+        scope_for_index(),
+        scope_for_profile(post.author_id),
+        scope_for_post(post.pk),
+    ]
+    for group_id in {post.group_id, *group_ids}:
+        if group_id is not None:
+            scopes.append(scope_for_group(group_id))
+    return scopes
+
+
+def timeline_scopes(user_id, author_ids):
+    """Области ленты подписок: её состав и профили авторов в ней.
+
+    Версия ленты меняется, когда в неё попадает или из неё уходит пост,
+    а правки и комментарии меняют версию профиля автора. Лента собирает
+    их при чтении, поэтому правка поста или комментарий не перебирают
+    всех подписчиков автора.
+    """
+    return [
+        scope_for_timeline(user_id),
+        *(scope_for_profile(author_id) for author_id in author_ids),
+    ]
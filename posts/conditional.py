@@ -0,0 +1,79 @@
+import hashlib
+
+from django.conf import settings
+
+from . import caching
+from .models import Group, TimelineEntry, User
+
+
+def _etag(request, *scopes):
+    """ETag страницы по версиям её областей кэша.
+
+    Разметка зависит от пользователя (ссылки автора, меню, форма с
+    CSRF-токеном), поэтому в тег входят и они. Шаблон не рендерится и
+    запросы ленты не выполняются, пока клиент не получит 304.
+    """
+    versions = caching.get_versions(*scopes)
+    parts = [f'{scope}={versions[scope]}' for scope in sorted(versions)]
+    parts.append(f'user={request.user.pk}')
+    parts.append(f'csrf={request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")}')
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def _user_pk(username):
+    return User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+
+
+def index_etag(request):
+    return _etag(request, caching.scope_for_index())
+
+
+def group_etag(request, slug):
+    group_pk = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_pk is None:
+        return None
+    return _etag(request, caching.scope_for_group(group_pk))
+
+
+def profile_etag(request, username):
+    user_pk = _user_pk(username)
+    if user_pk is None:
+        return None
+    return _etag(request, caching.scope_for_profile(user_pk))
+
+
+def post_etag(request, username, post_id):
+    # шапка страницы поста показывает счётчики автора
+    user_pk = _user_pk(username)
+    if user_pk is None:
+        return None
+    return _etag(
+        request,
+        caching.scope_for_post(post_id),
+        caching.scope_for_profile(user_pk),
+    )
+
+
+def follow_etag(request):
+    # авторы, чьи посты уже лежат в ленте; индекс (user, author) отдаёт
+    # их без чтения самой таблицы и без Follow
+    author_ids = TimelineEntry.objects.filter(
+        user=request.user
+    ).order_by().values_list('author_id', flat=True).distinct()
+    return _etag(
+        request, *caching.timeline_scopes(request.user.pk, author_ids)
+    )
+
+
+# имя url -> функция ETag; по этим страницам работает и кэш целых страниц
+PAGE_ETAGS = {
+    'index': index_etag,
+    'group': group_etag,
+    'profile': profile_etag,
+    'post': post_etag,
+    'post_comments': post_etag,
+}
@@ -0,0 +1,63 @@
+"""Число постов в лентах для постраничной навигации без COUNT(*).
+
+Счётчики лежат в кэше: при промахе считаются запросом, а сигналы
+записи сдвигают их через incr. Между пересчётом и incr может вклиниться
+запись, поэтому у счётчика есть таймаут COUNT_TIMEOUT: расхождение на
+пару постов живёт не дольше него. Ленте подписок счётчик не нужен —
+её ключ содержит версию состава ленты и сам устаревает при изменении.
+"""
+from django.core.cache import cache
+
+from . import caching
+from .models import Post, TimelineEntry
+
+
+COUNT_KEY = 'count:{}'
+COUNT_TIMEOUT = 10 * 60
+
+
+def _index():
+    return 'posts'
+
+
+def _group(group_id):
+    return f'group:{group_id}'
+
+
+def _get(name, compute):
+    return cache.get_or_set(COUNT_KEY.format(name), compute, COUNT_TIMEOUT)
+
+
+def _adjust(name, delta):
+    try:
+        cache.incr(COUNT_KEY.format(name), delta)
+    except ValueError:
+        # счётчика нет в кэше: первое чтение посчитает его заново
+        pass
+
+
+def index():
+    return _get(_index(), Post.objects.count)
+
+
+def group(group_id):
+    return _get(
+        _group(group_id), Post.objects.filter(group_id=group_id).count
+    )
+
+
+def timeline(user_id):
+    version = caching.get_version(caching.scope_for_timeline(user_id))
+    return _get(
+        f'timeline:{user_id}:{version}',
+        TimelineEntry.objects.filter(user_id=user_id).count,
+    )
+
+
+def adjust_index(delta):
+    _adjust(_index(), delta)
+
+
+def adjust_group(group_id, delta):
+    if group_id is not None:
+        _adjust(_group(group_id), delta)
@@ -0,0 +1,13 @@
+from django.conf import settings
+
+
+def apply_pragmas(cursor, pragmas=None):
+    """Выставляет прагмы SQLite на только что открытом соединении.
+
+    journal_mode=wal сохраняется в самом файле базы, остальные прагмы
+    действуют только на это соединение, поэтому их ставим на каждое.
+    """
+    if pragmas is None:
+        pragmas = settings.SQLITE_PRAGMAS
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
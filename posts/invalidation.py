@@ -0,0 +1,158 @@
+"""Какие области кэша устаревают при записи моделей.
+
+Зависимости объявляются функциями, которые по изменённому объекту
+перечисляют области (см. caching.scope_for_*). Новое кэшируемое
+представление регистрирует свою так же::
+
+    @invalidation.depends_on(Group, track=('title',))
+    def group_menu(group):
+        if invalidation.changed(group, 'title'):
+            yield 'group_menu'
+
+Функция вызывается после сохранения и перед удалением объекта (пока
+его связи ещё в базе); версии всех названных областей увеличиваются
+одним вызовом caching.bump. Поля из track читаются из базы перед
+сохранением, их прежние значения отдаёт previous(); другим
+обработчикам сигналов их можно заказать через track_fields().
+"""
+from collections import defaultdict
+
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+
+from . import caching
+from .models import Comment, Follow, Group, Post
+
+
+_registry = defaultdict(list)
+_tracked = defaultdict(set)
+
+
+def track_fields(model, *fields):
+    """Запоминать прежние значения fields перед сохранением model."""
+    if model not in _tracked:
+        _connect(model)
+    _tracked[model].update(fields)
+
+
+def depends_on(*models, track=()):
+    """Регистрирует функцию областей кэша, зависящих от моделей."""
+    def decorator(func):
+        for model in models:
+            track_fields(model, *track)
+            _registry[model].append(func)
+        return func
+    return decorator
+
+
+def previous(instance, field):
+    """Значение поля до сохранения; None для нового объекта."""
+    return getattr(instance, '_previous_values', {}).get(field)
+
+
+def changed(instance, field):
+    return previous(instance, field) != getattr(instance, field)
+
+
+def created(instance):
+    """Объект только что создан, а не изменён."""
+    return getattr(instance, '_created', False)
+
+
+def deleting(instance):
+    """Функцию областей вызвали перед удалением instance."""
+    return getattr(instance, '_deleting', False)
+
+
+def scopes_for(instance):
+    scopes = set()
+    for func in _registry[type(instance)]:
+        scopes.update(func(instance))
+    return scopes
+
+
+def _remember_previous(sender, instance, **kwargs):
+    fields = sorted(_tracked[sender])
+    instance._created = instance._state.adding
+    instance._previous_values = {}
+    if instance._state.adding or not fields:
+        return
+    row = sender._default_manager.filter(pk=instance.pk).values(
+        *fields
+    ).first()
+    if row is not None:
+        instance._previous_values = row
+
+
+def _saved(sender, instance, **kwargs):
+    caching.bump(*scopes_for(instance))
+
+
+def _deleting(sender, instance, **kwargs):
+    instance._deleting = True
+    instance._invalidated_scopes = scopes_for(instance)
+
+
+def _deleted(sender, instance, **kwargs):
+    caching.bump(*getattr(instance, '_invalidated_scopes', ()))
+
+
+def _connect(model):
+    uid = f'invalidation:{model._meta.label}'
+    pre_save.connect(_remember_previous, sender=model, dispatch_uid=uid)
+    post_save.connect(_saved, sender=model, dispatch_uid=uid)
+    pre_delete.connect(_deleting, sender=model, dispatch_uid=uid)
+    post_delete.connect(_deleted, sender=model, dispatch_uid=uid)
+
+
+@depends_on(Post, track=('group_id',))
+def post_pages(post):
+    # пост, перенесённый в другое сообщество, пропадает со старой страницы
+    yield from caching.post_scopes(
+        post, group_ids=[previous(post, 'group_id')]
+    )
+    # версии лент подписчиков меняют задачи timeline.fan_out_post и
+    # timeline.refresh_followers: подписчиков бывает слишком много для
+    # запроса
+
+
+@depends_on(Comment)
+def comment_pages(comment):
+    # счётчик комментариев выводится на карточке поста во всех лентах
+    post = Post.objects.filter(pk=comment.post_id).only(
+        'pk', 'author_id', 'group_id'
+    ).first()
+    if post is None:
+        return [caching.scope_for_post(comment.post_id)]
+    return caching.post_scopes(post)
+
+
+@depends_on(Follow)
+def follow_pages(follow):
+    # счётчики в шапках обоих профилей и состав ленты подписчика
+    return [
+        caching.scope_for_profile(follow.author_id),
+        caching.scope_for_profile(follow.user_id),
+        caching.scope_for_timeline(follow.user_id),
+    ]
+
+
+@depends_on(Group, track=('title', 'slug'))
+def group_pages(group):
+    scopes = [caching.scope_for_group(group.pk)]
+    if not (deleting(group) or group_renamed(group)):
+        return scopes
+    # название и ссылка группы есть на карточках её постов; сами карточки
+    # помечает изменёнными signals.group_saved / group_deleting
+    posts = Post.objects.filter(group_id=group.pk)
+    for post in posts.only('pk', 'author_id', 'group_id').iterator():
+        scopes.extend(caching.post_scopes(post))
+    return scopes
+
+
+def group_renamed(group):
+    """У сохранённой группы сменились название или адрес."""
+    return previous(group, 'title') is not None and (
+        changed(group, 'title') or changed(group, 'slug')
+    )
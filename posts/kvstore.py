@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class LRUCache:
+    """Ограниченный по размеру и времени жизни словарь в памяти процесса."""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+class PrefetchingKVStore(cached_db_kvstore.KVStore):
+    """KV-хранилище sorl-thumbnail с LRU в памяти и пакетной подгрузкой.
+
+    prefetch_raw() достаёт записи для всей страницы ленты одним
+    cache.get_many и одним запросом к БД; теги {% thumbnail %} потом
+    находят их в LRU без обращений к кэшу и базе.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.local = LRUCache(
+            settings.THUMBNAIL_LRU_SIZE, settings.THUMBNAIL_LRU_TIMEOUT
+        )
+
+    def prefetch_raw(self, keys):
+        missing = [key for key in set(keys) if key not in self.local]
+        if not missing:
+            return
+        found = self.cache.get_many(missing)
+        rest = [key for key in missing if key not in found]
+        if rest:
+            rows = dict(
+                KVStoreModel.objects.filter(key__in=rest).values_list(
+                    'key', 'value'
+                )
+            )
+            if rows:
+                self.cache.set_many(
+                    rows, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+                )
+            found.update(rows)
+        for key, value in found.items():
+            # отсутствие записи в LRU не кладём: миниатюру может
+            # дописать другой процесс
+            if value != cached_db_kvstore.EMPTY_VALUE:
+                self.local.set(key, value)
+
+    def prefetch_thumbnails(self, sources):
+        """Подгружает записи всех миниатюр картинок sources (ImageFile).
+
+        Ключи миниатюр берутся из списка, который sorl ведёт у исходной
+        картинки, поэтому совпадают с теми, что проверит {% thumbnail %}:
+        один пакет за списками, второй за самими записями.
+        """
+        lists = [add_prefix(source.key, 'thumbnails') for source in sources]
+        self.prefetch_raw(lists)
+        keys = []
+        for key in lists:
+            value = self.local.get(key)
+            if value is not None:
+                keys.extend(add_prefix(thumb) for thumb in deserialize(value))
+        if keys:
+            self.prefetch_raw(keys)
+
+    def _get_raw(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        value = super()._get_raw(key)
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self.local.set(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        for key in keys:
+            self.local.delete(key)
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        self.local.clear()
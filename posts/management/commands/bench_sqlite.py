@@ -0,0 +1,149 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.bench import percentile
+from posts.db import apply_pragmas
+
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT NOT NULL, '
+    'author_id INTEGER NOT NULL, pub_date TEXT NOT NULL)',
+    'CREATE INDEX post_pub_date ON post (pub_date)',
+)
+READ_QUERY = (
+    'SELECT id, text, author_id, pub_date FROM post '
+    'ORDER BY pub_date DESC, id DESC LIMIT 10 OFFSET ?'
+)
+WRITE_QUERY = 'INSERT INTO post (text, author_id, pub_date) VALUES (?, ?, ?)'
+
+
+class Profile:
+    """Как открываются соединения: прагмы и переиспользование."""
+
+    def __init__(self, name, pragmas, reuse):
+        self.name = name
+        self.pragmas = pragmas
+        self.reuse = reuse
+
+    def connect(self, path):
+        connection = sqlite3.connect(path, isolation_level=None)
+        apply_pragmas(connection.cursor(), self.pragmas)
+        return connection
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность чтения SQLite под непрерывной '
+        'записью: обычный режим с новым соединением на запрос против '
+        'рабочего профиля (SQLITE_PRAGMAS, постоянные соединения). '
+        'Работает на временной базе, рабочую не трогает.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=5.0)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--rows', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        profiles = [
+            Profile('default', {'journal_mode': 'delete'}, reuse=False),
+            Profile('production', settings.SQLITE_PRAGMAS, reuse=True),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in profiles:
+                path = os.path.join(directory, f'{profile.name}.sqlite3')
+                self.seed(profile, path, options['rows'])
+                result = self.run(
+                    profile, path, options['duration'], options['readers']
+                )
+                self.report(profile, result, options['duration'])
+
+    def seed(self, profile, path, rows):
+        connection = profile.connect(path)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.execute('BEGIN')
+        connection.executemany(WRITE_QUERY, (
+            (f'Пост {number}', number % 100, f'2020-01-01T00:00:{number}')
+            for number in range(rows)
+        ))
+        connection.execute('COMMIT')
+        connection.close()
+
+    def run(self, profile, path, duration, readers):
+        stop = threading.Event()
+        latencies = []
+        counters = {'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def read():
+            connection = profile.connect(path) if profile.reuse else None
+            local = []
+            errors = 0
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    if connection is None:
+                        # CONN_MAX_AGE = 0: соединение на каждый запрос
+                        fresh = profile.connect(path)
+                        fresh.execute(
+                            READ_QUERY, (random.randrange(100),)
+                        ).fetchall()
+                        fresh.close()
+                    else:
+                        connection.execute(
+                            READ_QUERY, (random.randrange(100),)
+                        ).fetchall()
+                except sqlite3.OperationalError:
+                    errors += 1
+                    continue
+                local.append(time.perf_counter() - started)
+            with lock:
+                latencies.extend(local)
+                counters['errors'] += errors
+
+        def write():
+            connection = profile.connect(path)
+            number = 0
+            while not stop.is_set():
+                try:
+                    connection.execute('BEGIN IMMEDIATE')
+                    connection.execute(WRITE_QUERY, (
+                        'Новый пост', number % 100,
+                        f'2021-01-01T00:00:{number}',
+                    ))
+                    connection.execute('COMMIT')
+                except sqlite3.OperationalError:
+                    with lock:
+                        counters['errors'] += 1
+                    continue
+                number += 1
+            counters['writes'] = number
+            connection.close()
+
+        threads = [threading.Thread(target=read) for _ in range(readers)]
+        threads.append(threading.Thread(target=write))
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return latencies, counters
+
+    def report(self, profile, result, duration):
+        latencies, counters = result
+        self.stdout.write(
+            f'{profile.name}: чтений {len(latencies) / duration:.0f}/с, '
+            f'записей {counters["writes"] / duration:.0f}/с, '
+            f'p50 {percentile(latencies, 0.5) * 1000:.2f} мс, '
+            f'p95 {percentile(latencies, 0.95) * 1000:.2f} мс, '
+            f'ошибок блокировки {counters["errors"]}'
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для уже загруженных картинок постов'
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).values_list('image', flat=True)
+        total = 0
+        for name in images.iterator():
+            thumbnails.generate(name)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано картинок: {total}'))
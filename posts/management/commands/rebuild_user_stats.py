@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import UserStats
+from posts.stats import stats_from_user, counted_users
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики профиля (посты, подписчики, подписки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        with transaction.atomic():
+            UserStats.objects.all().delete()
+            batch = []
+            for user in counted_users().order_by('pk').iterator():
+                batch.append(stats_from_user(user))
+                if len(batch) >= batch_size:
+                    UserStats.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+            UserStats.objects.bulk_create(batch)
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано профилей: {total}'))
@@ -0,0 +1,62 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts.routers import PRIMARY
+
+
+def replicate(target_path):
+    """Копирует основную базу в файл реплики через backup API SQLite.
+
+    Копия делается одним шагом под блокировкой чтения, поэтому реплика
+    получает согласованный снимок; читатели реплики ждут окончания
+    копирования через busy_timeout, а не получают половину страниц.
+    """
+    source = connections[PRIMARY]
+    source.ensure_connection()
+    target = sqlite3.connect(target_path, timeout=30)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет реплики SQLite из основной базы. С --interval работает '
+        'постоянно; интервал должен быть меньше REPLICA_PIN_SECONDS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            action='append',
+            help='файл реплики; по умолчанию все из DATABASE_REPLICAS',
+        )
+        parser.add_argument('--interval', type=float)
+
+    def handle(self, *args, **options):
+        if connections[PRIMARY].vendor != 'sqlite':
+            raise CommandError('Копирование реплик работает только с SQLite')
+        targets = options['target'] or [
+            settings.DATABASES[alias]['NAME']
+            for alias in settings.DATABASE_REPLICAS
+        ]
+        if not targets:
+            raise CommandError(
+                'Реплики не настроены: задайте DATABASE_REPLICAS или --target'
+            )
+        while True:
+            started = time.monotonic()
+            for path in targets:
+                replicate(path)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'Реплик обновлено: {len(targets)} за {elapsed:.2f} с'
+            )
+            if options['interval'] is None:
+                return
+            time.sleep(max(options['interval'] - elapsed, 0))
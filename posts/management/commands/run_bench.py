@@ -0,0 +1,271 @@
+import datetime as dt
+import json
+import random
+import subprocess
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY,
+)
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from posts.bench import summarize
+from posts.models import Follow, Group, Post, User, UserStats
+
+
+READS = ('index', 'group', 'profile', 'post', 'follow_index')
+WRITES = ('new_post', 'add_comment', 'follow')
+SAMPLE = 200
+
+
+class ClientDriver:
+    """Запросы через тестовый клиент Django, в том же процессе."""
+
+    def __init__(self, user):
+        self.client = Client()
+        self.client.force_login(user)
+
+    def request(self, method, path, data):
+        return getattr(self.client, method)(path, data).status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpDriver:
+    """Запросы к запущенному серверу; сессия пользователя создаётся в базе."""
+
+    def __init__(self, base_url, user):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(_NoRedirect)
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        self.cookies = {settings.SESSION_COOKIE_NAME: session.session_key}
+        # csrftoken ставит любая страница с формой
+        self.request('get', reverse('new_post'), {})
+
+    def request(self, method, path, data):
+        url = self.base_url + path
+        body = None
+        headers = {
+            'Cookie': '; '.join(f'{k}={v}' for k, v in self.cookies.items()),
+        }
+        if method == 'get' and data:
+            url += '?' + urllib.parse.urlencode(data)
+        elif method == 'post':
+            body = urllib.parse.urlencode(data).encode()
+            headers['X-CSRFToken'] = self.cookies.get(
+                settings.CSRF_COOKIE_NAME, ''
+            )
+        request = urllib.request.Request(
+            url, data=body, headers=headers, method=method.upper()
+        )
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                status, received = response.status, response.headers
+        except urllib.error.HTTPError as error:
+            status, received = error.code, error.headers
+        for header in received.get_all('Set-Cookie') or ():
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return status
+
+
+class Targets:
+    """Случайные, но воспроизводимые адреса для сценариев."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.groups = list(
+            Group.objects.values_list('slug', flat=True)[:SAMPLE]
+        )
+        self.posts = self._sample_posts()
+        self.authors = sorted({username for _, username in self.posts})
+        if not self.posts:
+            raise CommandError('В базе нет постов, запустите seed_bench')
+        stats = UserStats.objects.order_by('-following').first()
+        self.user = stats.user if stats else User.objects.first()
+
+    def _sample_posts(self):
+        # случайные pk из диапазона: ORDER BY RANDOM() читал бы всю таблицу
+        bounds = Post.objects.order_by('pk').values_list('pk', flat=True)
+        first, last = bounds.first(), bounds.last()
+        if first is None:
+            return []
+        ids = {self.rng.randint(first, last) for _ in range(SAMPLE)}
+        return list(Post.objects.filter(pk__in=ids).values_list(
+            'pk', 'author__username'
+        ))
+
+    def requests(self, scenario, count, worker):
+        """Список (метод, путь, данные); у каждого потока свои авторы."""
+        rng = random.Random(self.rng.random() + worker)
+        items = []
+        for number in range(count):
+            post_id, username = rng.choice(self.posts)
+            if scenario == 'index':
+                items.append(('get', reverse('index'),
+                              {'page': rng.randint(1, 5)}))
+            elif scenario == 'group' and self.groups:
+                items.append(('get', reverse('group', args=[
+                    rng.choice(self.groups)
+                ]), {}))
+            elif scenario == 'profile':
+                items.append(('get', reverse('profile', args=[username]), {}))
+            elif scenario == 'post':
+                items.append(('get', reverse('post', args=[
+                    username, post_id
+                ]), {}))
+            elif scenario == 'follow_index':
+                items.append(('get', reverse('follow_index'), {}))
+            elif scenario == 'new_post':
+                items.append(('post', reverse('new_post'),
+                              {'text': f'Нагрузочный пост {number}'}))
+            elif scenario == 'add_comment':
+                items.append(('post', reverse('add_comment', args=[
+                    username, post_id
+                ]), {'text': f'Нагрузочный комментарий {number}'}))
+            elif scenario == 'follow':
+                # подписка и отписка парами, на автора своего потока
+                author = self.authors[
+                    (worker + number // 2 * 7) % len(self.authors)
+                ]
+                name = 'profile_follow' if number % 2 == 0 else (
+                    'profile_unfollow'
+                )
+                items.append(('get', reverse(name, args=[author]), {}))
+        return items
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон страниц index, group, profile, post, '
+        'follow_index и записей (new_post, add_comment, follow). Печатает '
+        'JSON с p50/p95/p99 и пропускной способностью по сценариям. '
+        'По умолчанию запросы идут через тестовый клиент, с --url — к '
+        'запущенному серверу. Данные готовит seed_bench.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', choices=READS + WRITES,
+            help='можно несколько раз; по умолчанию все',
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--url', help='например http://127.0.0.1:8000')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='файл для JSON вместо stdout')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона: печатает разницу p95',
+        )
+
+    def handle(self, *args, **options):
+        targets = Targets(random.Random(options['seed']))
+        scenarios = options['scenario'] or list(READS + WRITES)
+        # объём данных до прогона: сценарии записи его меняют
+        meta = self.meta(options)
+        results = {}
+        for scenario in scenarios:
+            results[scenario] = self.run(scenario, targets, options)
+        report = {'meta': meta, 'scenarios': results}
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(data + '\n')
+        else:
+            self.stdout.write(data)
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def driver(self, options, user):
+        if options['url']:
+            return HttpDriver(options['url'], user)
+        return ClientDriver(user)
+
+    def run(self, scenario, targets, options):
+        workers = max(options['concurrency'], 1)
+        per_worker = max(options['requests'] // workers, 1)
+        plans = [
+            targets.requests(
+                scenario, options['warmup'] + per_worker, worker
+            )
+            for worker in range(workers)
+        ]
+
+        def work(plan):
+            driver = self.driver(options, targets.user)
+            for method, path, data in plan[:options['warmup']]:
+                driver.request(method, path, data)
+            latencies, errors = [], 0
+            for method, path, data in plan[options['warmup']:]:
+                started = time.perf_counter()
+                status = driver.request(method, path, data)
+                latencies.append(time.perf_counter() - started)
+                errors += status >= 400
+            if workers > 1:
+                # соединения потоков сами не закрываются
+                connections.close_all()
+            return latencies, errors
+
+        started = time.perf_counter()
+        if workers == 1:
+            outcomes = [work(plans[0])]
+        else:
+            with ThreadPoolExecutor(workers) as pool:
+                outcomes = list(pool.map(work, plans))
+        elapsed = time.perf_counter() - started
+        latencies = [value for outcome in outcomes for value in outcome[0]]
+        errors = sum(outcome[1] for outcome in outcomes)
+        return summarize(latencies, elapsed, errors)
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'timestamp': dt.datetime.now(dt.timezone.utc).isoformat(),
+            'mode': 'http' if options['url'] else 'client',
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+            'dataset': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+        }
+
+    def compare(self, path, results):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)['scenarios']
+        for scenario, result in results.items():
+            before = baseline.get(scenario)
+            if not before or not before['p95_ms']:
+                continue
+            change = (result['p95_ms'] / before['p95_ms'] - 1) * 100
+            self.stderr.write(
+                f'{scenario}: p95 {before["p95_ms"]:.1f} → '
+                f'{result["p95_ms"]:.1f} мс ({change:+.0f}%)'
+            )
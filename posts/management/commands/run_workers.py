@@ -0,0 +1,84 @@
+import multiprocessing
+import os
+import signal
+import socket
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import queue, workers
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи из очереди posts.queue: запускает '
+        'процессы-исполнители, возвращает в очередь брошенные задачи и '
+        'ставит периодические из TASK_SCHEDULE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            help='число процессов; 0 — выполнять задачи в этом процессе',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='выйти, когда готовых задач не останется',
+        )
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        if processes is None:
+            processes = settings.TASK_WORKERS
+        name = f'{socket.gethostname()}:{os.getpid()}'
+        self.tick()
+        context = multiprocessing.get_context('spawn')
+        stop = context.Event()
+        # SIGTERM останавливает так же, как Ctrl+C: исполнители доделывают
+        # текущую задачу и выходят
+        previous = signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            if processes:
+                self.supervise(
+                    context, name, processes, stop, options['burst']
+                )
+            else:
+                workers.work(name, stop, options['burst'], idle=self.tick)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+
+    def supervise(self, context, name, count, stop, burst):
+        processes = [
+            context.Process(
+                target=workers.run,
+                args=(
+                    os.environ['DJANGO_SETTINGS_MODULE'],
+                    f'{name}/{number}', stop, burst,
+                ),
+            )
+            for number in range(count)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Запущено исполнителей: {count}')
+        try:
+            while any(process.is_alive() for process in processes):
+                if stop.wait(settings.TASK_POLL_INTERVAL):
+                    break
+                close_old_connections()
+                self.tick()
+        finally:
+            stop.set()
+            for process in processes:
+                process.join()
+
+    def tick(self):
+        requeued = queue.requeue_stale()
+        if requeued:
+            self.stderr.write(f'Возвращено в очередь задач: {requeued}')
+        queue.schedule_periodic()
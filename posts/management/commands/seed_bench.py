@@ -0,0 +1,218 @@
+import datetime as dt
+import random
+import time
+from collections import Counter
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from posts import timeline
+from posts.management.commands.import_posts import historical_dates
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+USERNAME = 'bench{}'
+WORDS = (
+    'погода город утро кофе поезд книга музыка море горы фото кот собака '
+    'работа отпуск дождь снег лето зима весна осень друзья вечер прогулка '
+    'кино театр выставка парк река лес дорога сад обед ужин новости код'
+).split()
+
+
+def zipf_weights(size, exponent=1.1):
+    """Накопленные веса рангов: у немногих авторов большая часть активности."""
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(size)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными для нагрузочных тестов: '
+        'пользователи bench<N>, группы, подписки и активность со степенным '
+        'распределением (немного популярных авторов), посты за --days '
+        'дней и комментарии. Ленты подписок, счётчики и поисковый индекс '
+        'заполняются сразу. Для 1M постов и 100k пользователей: '
+        '--users 100000 --posts 1000000 --follows 50.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='в среднем подписок на пользователя',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя')
+        if User.objects.filter(username=USERNAME.format(0)).exists():
+            raise CommandError(
+                'Данные seed_bench уже есть, начните с пустой базы'
+            )
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.started = time.monotonic()
+        users = self.create_users(options['users'])
+        groups = self.create_groups(options['groups'])
+        # порядки авторов по популярности и по активности случайны, но
+        # воспроизводимы и независимы друг от друга. Активность
+        # распределена мягче: если самый читаемый автор пишет и больше
+        # всех, лента подписок растёт как квадрат числа пользователей
+        popular = self.rng.sample(users, len(users))
+        active = self.rng.sample(users, len(users))
+        following, followers = self.create_follows(
+            users, popular, zipf_weights(len(users)), options['follows']
+        )
+        with historical_dates():
+            plan = self.create_posts(
+                options['posts'], active, zipf_weights(len(users), 0.5),
+                groups, options['comments'], options['days'],
+            )
+            self.create_comments(users, plan)
+        self.create_stats(users, plan, following, followers)
+        cache.clear()
+        self.report('Готово')
+
+    def report(self, message):
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(f'[{elapsed:7.1f} с] {message}')
+
+    def save(self, model, objects, **kwargs):
+        """bulk_create пачками по batch_size, каждая в своей транзакции."""
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                self._save_batch(model, batch, **kwargs)
+                batch = []
+        if batch:
+            self._save_batch(model, batch, **kwargs)
+
+    def _save_batch(self, model, batch, **kwargs):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, **kwargs)
+
+    def next_pk(self, model):
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def create_users(self, total):
+        # пароль у всех один и непригодный для входа: хэшировать 100k
+        # разных паролей дольше, чем вставить сами строки
+        password = make_password(None)
+        first = self.next_pk(User)
+        self.save(User, (
+            User(pk=first + number, username=USERNAME.format(number),
+                 password=password)
+            for number in range(total)
+        ))
+        self.report(f'Пользователей: {total}')
+        return list(range(first, first + total))
+
+    def create_groups(self, total):
+        first = self.next_pk(Group)
+        self.save(Group, (
+            Group(pk=first + number, slug=f'bench-{number}',
+                  title=f'Группа {number}', description='')
+            for number in range(total)
+        ))
+        self.report(f'Групп: {total}')
+        return list(range(first, first + total))
+
+    def create_follows(self, users, ranked, weights, average):
+        following = Counter()
+        followers = Counter()
+
+        def follows():
+            for user_id in users:
+                size = min(
+                    len(users) - 1,
+                    int(self.rng.expovariate(1 / average)) if average else 0,
+                )
+                authors = set(self.rng.choices(
+                    ranked, cum_weights=weights, k=size
+                ))
+                authors.discard(user_id)
+                following[user_id] += len(authors)
+                for author_id in authors:
+                    followers[author_id] += 1
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.save(Follow, follows())
+        self.report(f'Подписок: {sum(following.values())}')
+        return following, followers
+
+    def create_posts(self, total, ranked, weights, groups, comments, days):
+        """Посты равномерно по времени; pk растут вместе с датой.
+
+        Дата и автор поста восстанавливаются по его номеру, поэтому для
+        комментариев и счётчиков посты не нужно держать в памяти.
+        """
+        first = self.next_pk(Post)
+        end = timezone.now()
+        start = end - dt.timedelta(days=days)
+        step = (end - start) / max(total, 1)
+        plan = {
+            'first': first,
+            'date': lambda number: start + step * number,
+            'authors': self.rng.choices(ranked, cum_weights=weights, k=total),
+            'comments': Counter(self.rng.choices(range(total), k=comments)),
+        }
+
+        def generate():
+            for number in range(total):
+                yield Post(
+                    pk=first + number,
+                    text=' '.join(self.rng.choices(WORDS, k=12)),
+                    author_id=plan['authors'][number],
+                    group_id=(
+                        self.rng.choice(groups)
+                        if groups and self.rng.random() < 0.5 else None
+                    ),
+                    pub_date=plan['date'](number),
+                    comment_count=plan['comments'][number],
+                )
+
+        self.save(Post, generate())
+        self.report(f'Постов: {total}')
+        timeline.fan_out_since(first)
+        self.report('Ленты подписок разложены')
+        return plan
+
+    def create_comments(self, users, plan):
+        def generate():
+            for number, count in sorted(plan['comments'].items()):
+                for _ in range(count):
+                    yield Comment(
+                        post_id=plan['first'] + number,
+                        author_id=self.rng.choice(users),
+                        text=' '.join(self.rng.choices(WORDS, k=6)),
+                        created=plan['date'](number) + dt.timedelta(
+                            minutes=self.rng.randrange(1, 24 * 60)
+                        ),
+                    )
+
+        self.save(Comment, generate())
+        self.report(f'Комментариев: {sum(plan["comments"].values())}')
+
+    def create_stats(self, users, plan, following, followers):
+        posted = Counter(plan['authors'])
+        self.save(UserStats, (
+            UserStats(
+                user_id=user_id,
+                posts=posted[user_id],
+                followers=followers[user_id],
+                following=following[user_id],
+            )
+            for user_id in users
+        ))
+        self.report('Счётчики профилей посчитаны')
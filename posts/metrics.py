@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.template.backends.django import (
+    DjangoTemplates, Template, reraise,
+)
+from django.template import TemplateDoesNotExist
+
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('queries', 'db_time', 'cache_hits', 'cache_misses', 'render_time')
+
+_state = threading.local()
+
+
+class RequestMetrics:
+    """Счётчики одного запроса; время — в секундах."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.render_time = 0.0
+        self.total_time = 0.0
+
+    def as_dict(self):
+        data = {field: getattr(self, field) for field in FIELDS}
+        data['total_time'] = self.total_time
+        return data
+
+
+def current():
+    """Метрики текущего запроса или None вне collect()."""
+    return getattr(_state, 'metrics', None)
+
+
+def record_cache(hits, misses):
+    metrics = current()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+def _timed_query(execute, sql, params, many, context):
+    metrics = current()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_time += time.perf_counter() - started
+
+
+@contextmanager
+def collect():
+    """Собирает метрики кода внутри блока по всем базам из DATABASES."""
+    metrics = RequestMetrics()
+    previous = current()
+    _state.metrics = metrics
+    started = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_timed_query))
+            yield metrics
+    finally:
+        metrics.total_time = time.perf_counter() - started
+        _state.metrics = previous
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics = current()
+            if metrics is not None:
+                metrics.render_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, который учитывает время отрисовки.
+
+    Замеряется только шаблон верхнего уровня: {% include %} идёт мимо
+    этого класса и попадает в то же время, а не складывается дважды.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class Aggregator:
+    """Сводка метрик по представлениям, раз в interval секунд — в лог.
+
+    Сводка своя у каждого процесса, каждый пишет её отдельной строкой
+    на представление: запросов, сумма и максимум по каждому счётчику.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.views = defaultdict(lambda: defaultdict(float))
+        self.started = time.monotonic()
+
+    def add(self, view, metrics):
+        with self.lock:
+            totals = self.views[view]
+            totals['requests'] += 1
+            for field, value in metrics.as_dict().items():
+                totals[field] += value
+                totals[f'{field}_max'] = max(totals[f'{field}_max'], value)
+            if time.monotonic() - self.started >= self.interval:
+                self.flush()
+
+    def flush(self):
+        for view, totals in sorted(self.views.items()):
+            requests = totals['requests']
+            logger.info(
+                '%s: %d запросов, SQL %.1f (макс. %d), БД %.1f мс, '
+                'кэш %d/%d, шаблоны %.1f мс, всего %.1f мс (макс. %.1f)',
+                view,
+                requests,
+                totals['queries'] / requests,
+                totals['queries_max'],
+                totals['db_time'] / requests * 1000,
+                totals['cache_hits'],
+                totals['cache_hits'] + totals['cache_misses'],
+                totals['render_time'] / requests * 1000,
+                totals['total_time'] / requests * 1000,
+                totals['total_time_max'] * 1000,
+            )
+        self.reset()
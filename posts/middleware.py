@@ -0,0 +1,167 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+
+from . import metrics, profiling, routers, stampede
+from .conditional import PAGE_ETAGS
+
+
+class RequestMetricsMiddleware:
+    """Считает SQL-запросы, время БД, попадания в кэш и время шаблонов.
+
+    В DEBUG значения уходят в заголовки X-Metrics-* ответа, иначе —
+    в сводку по представлениям, которая раз в METRICS_INTERVAL секунд
+    пишется в лог posts.metrics. Стоит первым, чтобы учесть остальные
+    middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.aggregator = metrics.Aggregator(settings.METRICS_INTERVAL)
+
+    def __call__(self, request):
+        with metrics.collect() as collected:
+            request.metrics = collected
+            response = self.get_response(request)
+        if settings.DEBUG:
+            response['X-Metrics-Queries'] = collected.queries
+            response['X-Metrics-DB-Time'] = f'{collected.db_time * 1000:.2f}'
+            response['X-Metrics-Cache'] = (
+                f'{collected.cache_hits} hit, {collected.cache_misses} miss'
+            )
+            response['X-Metrics-Render-Time'] = (
+                f'{collected.render_time * 1000:.2f}'
+            )
+        else:
+            match = request.resolver_match
+            view = match.view_name if match else 'unresolved'
+            self.aggregator.add(view, collected)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Включает чтение с реплик и «прилипание» к основной базе.
+
+    Запрос, который что-то записал, ставит cookie на REPLICA_PIN_SECONDS:
+    пока реплика могла не догнать основную базу, чтение этого браузера
+    идёт в основную, и пользователь сразу видит свои изменения.
+    Небезопасные методы читают основную базу с начала запроса.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = (
+            request.method not in ('GET', 'HEAD', 'OPTIONS')
+            or settings.REPLICA_PIN_COOKIE in request.COOKIES
+        )
+        with routers.replica_reads(not pinned):
+            response = self.get_response(request)
+            wrote = routers.wrote()
+        if wrote or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+            )
+        return response
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос по требованию и сохраняет RequestProfile.
+
+    Включается подписанным заголовком X-Profile (profiling.make_token()),
+    флагом ?_profile=1 у сотрудников или выборкой PROFILE_SAMPLE_RATE.
+    Стоит после AuthenticationMiddleware, чтобы проверить сотрудника.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reason = profiling.trigger(request)
+        if reason is None:
+            return self.get_response(request)
+        with profiling.profile() as trace:
+            response = self.get_response(request)
+        profiling.save(request, response, trace, reason)
+        return response
+
+
+class AnonymousPageCacheMiddleware:
+    """Кэш целых страниц для анонимных GET-запросов.
+
+    Ключ — путь с параметрами и ETag страницы, который собран из версий
+    её областей кэша, поэтому сигналы записи инвалидируют и этот кэш.
+    Не сохраняются ответы авторизованным пользователям, ответы с формой
+    (CSRF-токеном) или с cookie и ответы с кодом, отличным от 200.
+    Устаревшую страницу пересобирает один запрос, остальные получают
+    старую, см. posts.stampede.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, '_page_cache_key', None)
+        if key is None:
+            return response
+        if not self._can_store(request, response):
+            self._finish(request)
+        elif hasattr(response, 'render') and callable(response.render):
+            response.add_post_render_callback(
+                lambda rendered: self._store(request, rendered)
+            )
+        else:
+            self._store(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        etag_func = PAGE_ETAGS.get(request.resolver_match.url_name)
+        if etag_func is None or request.user.is_authenticated:
+            return None
+        etag = etag_func(request, *view_args, **view_kwargs)
+        if etag is None:
+            return None
+        key = f'page:{etag}:{request.get_full_path()}'
+        lookup = stampede.read(cache, key)
+        if not lookup.rebuild:
+            return get_conditional_response(
+                request, etag=lookup.value.get('ETag'), response=lookup.value
+            )
+        request._page_cache_key = key
+        request._page_cache_locked = lookup.locked
+        request._page_cache_started = time.perf_counter()
+        return None
+
+    def _store(self, request, response):
+        try:
+            stampede.write(
+                cache,
+                request._page_cache_key,
+                response,
+                settings.PAGE_CACHE_TIMEOUT,
+                time.perf_counter() - request._page_cache_started,
+            )
+        finally:
+            self._finish(request)
+
+    def _finish(self, request):
+        if request._page_cache_locked:
+            stampede.release(cache, request._page_cache_key)
+
+    def _can_store(self, request, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+            and not request.user.is_authenticated
+        )
@@ -0,0 +1,82 @@
+# Generated by Django 2.2.6 on 2026-10-18 19:00
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    """Оставляет первую из повторных подписок и пересчитывает счётчики."""
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    duplicates = Follow.objects.values('user_id', 'author_id').annotate(
+        first=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    if not duplicates.exists():
+        return
+    affected = set()
+    for row in duplicates.iterator():
+        affected.update((row['user_id'], row['author_id']))
+        Follow.objects.filter(
+            user_id=row['user_id'], author_id=row['author_id']
+        ).exclude(pk=row['first']).delete()
+
+    def count(field):
+        return Coalesce(Subquery(
+            Follow.objects.filter(**{field: OuterRef('user_id')})
+            .order_by().values(field).annotate(total=Count('pk'))
+            .values('total')
+        ), 0)
+
+    UserStats.objects.filter(user_id__in=affected).update(
+        followers=count('author_id'), following=count('user_id')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_search_index'),
+    ]
+
+    # CREATE INDEX в SQLite не перестраивает таблицу, а AddConstraint
+    # перестроил бы posts_follow целиком; уникальный индекс даёт ту же
+    # гарантию, поэтому в базе создаём его, а в состоянии — ограничение
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE UNIQUE INDEX following_unique '
+                    'ON posts_follow (user_id, author_id)',
+                    'DROP INDEX following_unique',
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='follow',
+                    constraint=models.UniqueConstraint(
+                        fields=('user', 'author'), name='following_unique'
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['pub_date'], name='post_pub_date'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='post_group_pub_date'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='post_author_pub_date'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='comment_post_created'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.6 on 2026-10-18 19:40
+
+from importlib import import_module
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+search_index = import_module('posts.migrations.0014_search_index')
+
+
+def copy_pub_date(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(modified=F('pub_date'))
+
+
+def restore_search_triggers(apps, schema_editor):
+    # SQLite добавляет и удаляет столбец, пересоздавая таблицу, и вместе
+    # со старой таблицей пропадают триггеры поискового индекса
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in search_index.create_sql('posts_post', 'posts_post_fts'):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_request_profile'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            migrations.RunPython.noop, restore_search_triggers
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='modified',
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_pub_date, migrations.RunPython.noop),
+        migrations.RunPython(
+            restore_search_triggers, migrations.RunPython.noop
+        ),
+    ]
@@ -17,6 +17,8 @@ class Group(models.Model):
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField("date published", auto_now_add=True)
+    # время последнего сохранения; входит в ключ кэша карточки поста
+    modified = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(
         User, 
         on_delete=models.CASCADE, 
@@ -33,8 +35,25 @@ class Post(models.Model):
     # поле для картинки
     image = models.ImageField(upload_to='posts/', blank=True, null=True)  
 
+    # счётчик комментариев, его ведут сигналы Comment
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         ordering = ('-pub_date',)
+        # по индексу на каждую ленту: главная, группа, профиль. pk в
+        # SQLite — rowid, он неявно замыкает любой индекс, поэтому
+        # сортировка (-pub_date, -pk) идёт обратным проходом без сортировки
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date'),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date',
+            ),
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date',
+            ),
+        ]
 
     def __str__(self):
         # return (f'{self.group.title}, '
@@ -59,6 +78,12 @@ class Comment(models.Model):
 
     class Meta:  
         ordering = ('created',) 
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created',
+            ),
+        ]
 
     def __str__(self):  
         return 'Comment by {} on {}'.format(self.author, self.post)
@@ -77,7 +102,145 @@ class Follow(models.Model):
     )
     
     class Meta:
-        models.UniqueConstraint(
-            fields=['user', 'author'], 
-            name='following_unique',
-        )
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='following_unique',
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись ленты подписок: пост автора, на которого подписан user.
+
+    Заполняется при публикации поста (для всех подписчиков автора) и при
+    подписке, поэтому лента follow_index читается одним диапазоном индекса.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='timeline_user_pub_date',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='timeline_unique',
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики для шапки профиля, ведутся сигналами Post и Follow."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+    )
+    posts = models.PositiveIntegerField(default=0)
+    followers = models.PositiveIntegerField(default=0)
+    following = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Stats of {self.user_id}'
+
+
+class RequestProfile(models.Model):
+    """Профиль одного запроса: cProfile и SQL, см. posts.profiling."""
+    TRIGGERS = (
+        ('header', 'Подписанный заголовок'),
+        ('query', 'Флаг в адресе'),
+        ('sample', 'Выборка'),
+    )
+
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    view_name = models.CharField(max_length=100, blank=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="+",
+    )
+    trigger = models.CharField(max_length=10, choices=TRIGGERS)
+    status = models.PositiveSmallIntegerField()
+    # время — в миллисекундах
+    duration = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    sql_time = models.FloatField()
+    # marshal-дамп pstats, как у Profile.dump_stats
+    stats = models.BinaryField()
+    summary = models.TextField()
+    sql = models.TextField()
+
+    class Meta:
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration:.0f} мс)'
+
+
+class Task(models.Model):
+    """Фоновая задача очереди, см. posts.queue."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    # путь к функции с @task, например posts.thumbnails.generate
+    name = models.CharField(max_length=200)
+    # JSON {"args": [...], "kwargs": {...}}
+    payload = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    run_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    finished = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('run_at',)
+        # выборка готовых задач: status = queued AND run_at <= now
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'], name='task_status_run_at'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} [{self.status}]'
@@ -0,0 +1,189 @@
+import base64
+import binascii
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+# сколько номеров страниц показывать по обе стороны от текущей
+PAGE_WINDOW = 2
+
+
+def encode_cursor(value, pk):
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = f'{value}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, parse=parse_datetime):
+    """Разбирает курсор в пару (значение, pk); испорченный курсор даёт None.
+
+    parse превращает строку обратно в значение ключа: по умолчанию это
+    дата, для ранга поиска — float.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        value, pk = raw.rsplit('|', 1)
+        value, pk = parse(value), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        # курсоры считаем сразу: object_list потом можно подменить
+        self.next_cursor = None
+        self.previous_cursor = None
+        if object_list and has_next:
+            self.next_cursor = paginator.cursor_for(object_list[-1])
+        if object_list and has_previous:
+            self.previous_cursor = paginator.cursor_for(object_list[0])
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу (field, pk) без COUNT(*) и OFFSET.
+
+    Стоимость любой страницы одинакова: выборка идёт от курсора
+    по индексу и ограничена per_page + 1 строкой.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 descending=True):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.field = field
+        self.descending = descending
+
+    def cursor_for(self, obj):
+        return encode_cursor(getattr(obj, self.field), obj.pk)
+
+    def page_query(self, cursor, forward):
+        """Запрос per_page + 1 строк после (или до) курсора."""
+        descending = self.descending == forward
+        lookup = 'lt' if descending else 'gt'
+        prefix = '-' if descending else ''
+        queryset = self.object_list
+        if cursor is not None:
+            value, pk = cursor
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value}) |
+                Q(**{self.field: value, f'pk__{lookup}': pk})
+            )
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}pk')
+        return queryset[:self.per_page + 1]
+
+    def _slice(self, cursor, forward):
+        return list(self.page_query(cursor, forward))
+
+    def iterate(self):
+        """Обходит весь список кусками по per_page, каждый — по ключу."""
+        cursor = None
+        while True:
+            items = self._slice(cursor, forward=True)
+            yield from items[:self.per_page]
+            if len(items) <= self.per_page:
+                return
+            last = items[self.per_page - 1]
+            cursor = getattr(last, self.field), last.pk
+
+    def get_page(self, after=None, before=None):
+        before = decode_cursor(before)
+        if before is not None:
+            items = self._slice(before, forward=False)
+            has_previous = len(items) > self.per_page
+            items = items[:self.per_page][::-1]
+            return CursorPage(items, self, True, has_previous)
+        after = decode_cursor(after)
+        items = self._slice(after, forward=True)
+        has_next = len(items) > self.per_page
+        return CursorPage(items[:self.per_page], self, has_next,
+                          after is not None)
+
+
+def page_window(page, size=PAGE_WINDOW):
+    """Номера страниц для навигации: первая, последняя и size соседних
+    с текущей с каждой стороны; None — пропуск между ними."""
+    last = page.paginator.num_pages
+    numbers = sorted({
+        1, last,
+        *range(max(1, page.number - size), min(last, page.number + size) + 1),
+    })
+    window = []
+    for previous, number in zip([None] + numbers, numbers):
+        if previous is not None and number - previous > 1:
+            window.append(None)
+        window.append(number)
+    return window
+
+
+def paginate(request, object_list, per_page=POSTS_PER_PAGE, field='pub_date',
+             count=None):
+    """Возвращает (paginator, page) для ленты.
+
+    С ?after= или ?before= страница выбирается по курсору, иначе — по
+    номеру ?page=. У обычной страницы тоже есть курсоры соседних страниц,
+    поэтому переход «вперёд/назад» из неё сразу идёт по ключу.
+
+    count — функция, которая возвращает число записей без COUNT(*),
+    например счётчик из posts.counts; зовётся только для страницы по
+    номеру. Навигация выводит лишь окно номеров page.window.
+    """
+    object_list = object_list.order_by(f'-{field}', '-pk')
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before:
+        paginator = CursorPaginator(object_list, per_page, field=field)
+        return paginator, paginator.get_page(after=after, before=before)
+    paginator = Paginator(object_list, per_page)
+    if count is not None:
+        # count у Paginator — cached_property, значение на экземпляре
+        # заменяет запрос
+        paginator.count = count()
+    page = paginator.get_page(request.GET.get('page'))
+    page.window = page_window(page)
+    objects = list(page.object_list)
+    page.object_list = objects
+    if objects and page.has_next():
+        page.next_cursor = encode_cursor(
+            getattr(objects[-1], field), objects[-1].pk
+        )
+    if objects and page.has_previous():
+        page.previous_cursor = encode_cursor(
+            getattr(objects[0], field), objects[0].pk
+        )
+    return paginator, page
@@ -0,0 +1,148 @@
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+
+from .models import RequestProfile
+
+
+SALT = 'posts.profiling'
+HEADER = 'HTTP_X_PROFILE'
+QUERY_FLAG = '_profile'
+SUMMARY_LINES = 60
+
+
+def make_token():
+    """Подписанное значение для заголовка X-Profile.
+
+    Срок действия проверяется при запросе по PROFILE_TOKEN_MAX_AGE,
+    поэтому утёкший токен перестаёт работать сам.
+    """
+    return signing.dumps({'created': time.time()}, salt=SALT)
+
+
+def trigger(request):
+    """Почему запрос нужно профилировать, или None.
+
+    Порядок: подписанный заголовок, флаг ?_profile=1 для сотрудников,
+    затем выборка с частотой PROFILE_SAMPLE_RATE.
+    """
+    token = request.META.get(HEADER)
+    if token:
+        try:
+            signing.loads(
+                token, salt=SALT, max_age=settings.PROFILE_TOKEN_MAX_AGE
+            )
+        except signing.BadSignature:
+            pass
+        else:
+            return 'header'
+    user = getattr(request, 'user', None)
+    if request.GET.get(QUERY_FLAG) and user is not None and user.is_staff:
+        return 'query'
+    rate = settings.PROFILE_SAMPLE_RATE
+    if rate and random.random() < rate:
+        return 'sample'
+    return None
+
+
+def _param_types(params, many):
+    """Типы параметров запроса вместо их значений."""
+    if many:
+        params = next(iter(params), ())
+    if isinstance(params, dict):
+        params = params.values()
+    return ', '.join(type(param).__name__ for param in params or ())
+
+
+class Trace:
+    """Профиль и SQL одного запроса."""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.duration = 0.0
+
+    def _record(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # значения параметров не сохраняются: в них бывают ключи
+            # сессий, хэши паролей и адреса почты
+            self.queries.append((
+                context['connection'].alias,
+                time.perf_counter() - started,
+                sql,
+                _param_types(params, many),
+            ))
+
+    @property
+    def sql_time(self):
+        return sum(query[1] for query in self.queries)
+
+    def stats(self):
+        """Статистика в формате pstats.dump_stats — её читают snakeviz и
+        pstats.Stats, а flameprof строит по ней flamegraph."""
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+    def summary(self):
+        output = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(SUMMARY_LINES)
+        return output.getvalue()
+
+    def sql_log(self):
+        return '\n'.join(
+            f'[{alias}] {duration * 1000:8.2f} мс  {sql}  ({types})'
+            for alias, duration, sql, types in self.queries
+        )
+
+
+@contextmanager
+def profile():
+    """Профилирует код внутри блока и пишет его SQL по всем базам."""
+    trace = Trace()
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(trace._record))
+        trace.profiler.enable()
+        try:
+            yield trace
+        finally:
+            trace.profiler.disable()
+            trace.duration = time.perf_counter() - started
+
+
+def save(request, response, trace, reason):
+    """Сохраняет профиль и оставляет не больше PROFILE_KEEP последних."""
+    match = request.resolver_match
+    user = getattr(request, 'user', None)
+    saved = RequestProfile.objects.create(
+        method=request.method,
+        path=request.get_full_path()[:255],
+        view_name=match.view_name if match else '',
+        user=user if user is not None and user.is_authenticated else None,
+        trigger=reason,
+        status=response.status_code,
+        duration=trace.duration * 1000,
+        query_count=len(trace.queries),
+        sql_time=trace.sql_time * 1000,
+        stats=trace.stats(),
+        summary=trace.summary(),
+        sql=trace.sql_log(),
+    )
+    stale = RequestProfile.objects.order_by('-created', '-pk').values_list(
+        'pk', flat=True
+    )[settings.PROFILE_KEEP:]
+    RequestProfile.objects.filter(pk__in=list(stale)).delete()
+    return saved
@@ -0,0 +1,209 @@
+"""Очередь фоновых задач в основной базе, без внешнего брокера.
+
+Функция с декоратором @task ставится в очередь вызовом .delay(...)
+или .schedule(countdown=..., eta=..., ...): в таблицу Task пишется
+строка с её именем и аргументами в JSON. Запись идёт в текущей
+транзакции, поэтому задача видна исполнителям только после коммита
+записи, которая её породила. Выполняют задачи процессы run_workers.
+
+Задача может выполниться больше одного раза (исполнитель упал после
+работы, но до отметки о выполнении), поэтому она должна быть
+идемпотентной и принимать идентификаторы, а не объекты. При ошибке
+задача повторяется через retry_delay * 2^(попытка - 1) секунд, пока
+не исчерпает max_attempts.
+
+С TASKS_EAGER (в разработке и тестах) задача выполняется сразу при
+.delay(), а её ошибка только пишется в лог.
+"""
+import datetime as dt
+import json
+import logging
+import random
+import traceback
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+
+logger = logging.getLogger(__name__)
+
+
+class TaskFunction:
+    """Обёртка функции задачи; вызов напрямую выполняет её сразу."""
+
+    def __init__(self, func, max_attempts, retry_delay):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.__doc__ = func.__doc__
+
+    def __repr__(self):
+        return f'<task {self.name}>'
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return self.schedule(args=args, kwargs=kwargs)
+
+    def schedule(self, args=(), kwargs=None, countdown=None, eta=None):
+        """Ставит задачу в очередь на eta или через countdown секунд."""
+        kwargs = kwargs or {}
+        if settings.TASKS_EAGER:
+            try:
+                self.func(*args, **kwargs)
+            except Exception:
+                logger.exception('Задача %s завершилась ошибкой', self.name)
+            return None
+        if eta is None:
+            eta = timezone.now() + dt.timedelta(seconds=countdown or 0)
+        return Task.objects.create(
+            name=self.name,
+            payload=json.dumps({'args': list(args), 'kwargs': kwargs}),
+            run_at=eta,
+            max_attempts=self.max_attempts,
+        )
+
+
+def task(func=None, *, max_attempts=None, retry_delay=None):
+    """Делает функцию фоновой задачей: @task или @task(max_attempts=5)."""
+    def decorator(func):
+        return TaskFunction(
+            func,
+            max_attempts or settings.TASK_MAX_ATTEMPTS,
+            settings.TASK_RETRY_DELAY if retry_delay is None else retry_delay,
+        )
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def backoff(attempt, retry_delay):
+    """Пауза перед повтором: удваивается с каждой попыткой, ±10%."""
+    delay = retry_delay * 2 ** (attempt - 1)
+    return delay * random.uniform(0.9, 1.1)
+
+
+def claim(worker):
+    """Забирает одну готовую задачу для исполнителя worker или None.
+
+    Захват — условный UPDATE по статусу: из нескольких процессов строку
+    получит только один, без блокировок на чтение.
+    """
+    now = timezone.now()
+    ready = Task.objects.filter(
+        status=Task.QUEUED, run_at__lte=now
+    ).order_by('run_at', 'pk').values_list('pk', flat=True)
+    for pk in ready[:10]:
+        claimed = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def execute(job):
+    """Выполняет захваченную задачу и записывает результат."""
+    func = None
+    try:
+        func = import_string(job.name)
+        payload = json.loads(job.payload)
+        func(*payload['args'], **payload['kwargs'])
+    except Exception:
+        _failed(job, func)
+        return False
+    Task.objects.filter(pk=job.pk).update(
+        status=Task.DONE, locked_by='', locked_at=None,
+        finished=timezone.now(),
+    )
+    return True
+
+
+def _failed(job, func):
+    error = traceback.format_exc()
+    now = timezone.now()
+    if job.attempts < job.max_attempts:
+        retry_delay = getattr(func, 'retry_delay', settings.TASK_RETRY_DELAY)
+        run_at = now + dt.timedelta(
+            seconds=backoff(job.attempts, retry_delay)
+        )
+        logger.warning(
+            'Задача %s (#%d), попытка %d из %d: ошибка, повтор в %s',
+            job.name, job.pk, job.attempts, job.max_attempts, run_at,
+        )
+        Task.objects.filter(pk=job.pk).update(
+            status=Task.QUEUED, run_at=run_at, locked_by='',
+            locked_at=None, last_error=error,
+        )
+        return
+    logger.error(
+        'Задача %s (#%d) не выполнена за %d попыток\n%s',
+        job.name, job.pk, job.attempts, error,
+    )
+    Task.objects.filter(pk=job.pk).update(
+        status=Task.FAILED, locked_by='', locked_at=None,
+        finished=now, last_error=error,
+    )
+
+
+def run_next(worker):
+    """Выполняет одну готовую задачу; False, если готовых нет."""
+    job = claim(worker)
+    if job is None:
+        return False
+    execute(job)
+    return True
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи упавших исполнителей.
+
+    Задача, которая выполняется дольше TASK_TIMEOUT, считается брошенной:
+    её попытка уже засчитана при захвате.
+    """
+    stale = Task.objects.filter(
+        status=Task.RUNNING,
+        locked_at__lt=timezone.now() - dt.timedelta(
+            seconds=settings.TASK_TIMEOUT
+        ),
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED, locked_by='', locked_at=None,
+        finished=timezone.now(), last_error='Превышен TASK_TIMEOUT',
+    )
+    return stale.update(status=Task.QUEUED, locked_by='', locked_at=None)
+
+
+def schedule_periodic():
+    """Ставит периодические задачи из TASK_SCHEDULE.
+
+    У каждой задачи в очереди не больше одного экземпляра: следующий
+    ставится через заданный интервал после того, как прошлый выполнен.
+    """
+    pending = set(Task.objects.filter(
+        name__in=list(settings.TASK_SCHEDULE),
+        status__in=(Task.QUEUED, Task.RUNNING),
+    ).values_list('name', flat=True))
+    for name, every in settings.TASK_SCHEDULE.items():
+        if name not in pending:
+            import_string(name).schedule(countdown=every)
+
+
+@task
+def purge():
+    """Удаляет выполненные задачи старше TASK_KEEP_DONE секунд."""
+    Task.objects.filter(
+        status=Task.DONE,
+        finished__lt=timezone.now() - dt.timedelta(
+            seconds=settings.TASK_KEEP_DONE
+        ),
+    ).delete()
@@ -0,0 +1,80 @@
+import os
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+PRIMARY = 'default'
+
+_state = threading.local()
+
+
+def replica_aliases():
+    """Реплики из DATABASE_REPLICAS, кроме зеркал основной базы.
+
+    В тестах реплика объявлена зеркалом (TEST MIRROR) и указывает на ту
+    же базу: читать её через отдельное соединение незачем. Реплика
+    SQLite, чей файл replicate_db ещё не создал, тоже пропускается.
+    """
+    primary = connections[PRIMARY].settings_dict['NAME']
+    return [
+        alias for alias in settings.DATABASE_REPLICAS
+        if connections[alias].settings_dict['NAME'] != primary
+        and _available(connections[alias])
+    ]
+
+
+def _available(connection):
+    if connection.vendor != 'sqlite':
+        return True
+    return os.path.exists(connection.settings_dict['NAME'])
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Разрешает чтение с реплик, пока в этом потоке не было записи."""
+    previous = getattr(_state, 'replicas', False), getattr(
+        _state, 'wrote', False
+    )
+    _state.replicas, _state.wrote = enabled, False
+    try:
+        yield
+    finally:
+        _state.replicas, _state.wrote = previous
+
+
+def wrote():
+    return getattr(_state, 'wrote', False)
+
+
+class PrimaryReplicaRouter:
+    """Запись — в основную базу, чтение — с реплики.
+
+    Реплики используются только внутри replica_reads(), то есть в
+    запросах, которые middleware пометило как безопасные; команды,
+    миграции и сигналы вне запроса читают основную базу. После первой
+    записи в запросе чтение до его конца тоже идёт в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_state, 'replicas', False) or wrote():
+            return PRIMARY
+        aliases = replica_aliases()
+        return random.choice(aliases) if aliases else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схема попадает на реплики вместе с данными при копировании
+        return db == PRIMARY
@@ -0,0 +1,122 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Post
+from .pagination import CursorPage, decode_cursor, encode_cursor
+from .queue import task
+
+
+INDEXES = {
+    Post: 'posts_post_fts',
+    Comment: 'posts_comment_fts',
+}
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def to_match(query):
+    """Превращает ввод пользователя в безопасное выражение MATCH.
+
+    Каждое слово берётся в кавычки, последнее ищется по префиксу, чтобы
+    синтаксис FTS5 из запроса не ломал поиск.
+    """
+    words = WORD.findall(query or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def filter_queryset(queryset, query):
+    """Оставляет в queryset только объекты, подходящие под запрос."""
+    match = to_match(query)
+    if match is None:
+        return queryset.none()
+    if not is_available():
+        for word in WORD.findall(query):
+            queryset = queryset.filter(text__icontains=word)
+        return queryset
+    fts = INDEXES[queryset.model]
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [match]
+    ))
+
+
+def rebuild():
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        for fts in INDEXES.values():
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+@task
+def optimize():
+    """Сливает сегменты индексов FTS5, накопленные триггерами записи."""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        for fts in INDEXES.values():
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('optimize')")
+
+
+class SearchPaginator:
+    """Постраничный вывод результатов по ключу (ранг bm25, id).
+
+    Меньший ранг bm25 означает более релевантный результат.
+    """
+
+    def __init__(self, queryset, query, per_page):
+        self.queryset = queryset
+        self.match = to_match(query)
+        self.per_page = int(per_page)
+        self.fts = INDEXES[queryset.model]
+
+    def cursor_for(self, obj):
+        return encode_cursor(repr(obj.search_rank), obj.pk)
+
+    def _ranked(self, cursor, forward):
+        lookup, order = ('>', 'ASC') if forward else ('<', 'DESC')
+        sql = (
+            f'SELECT id, rank FROM ('
+            f'SELECT rowid AS id, bm25({self.fts}) AS rank FROM {self.fts} '
+            f'WHERE {self.fts} MATCH %s)'
+        )
+        params = [self.match]
+        if cursor is not None:
+            rank, pk = cursor
+            sql += f' WHERE rank {lookup} %s OR (rank = %s AND id {lookup} %s)'
+            params += [rank, rank, pk]
+        sql += f' ORDER BY rank {order}, id {order} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            return db_cursor.fetchall()
+
+    def get_page(self, after=None, before=None):
+        if self.match is None or not is_available():
+            return CursorPage([], self, False, False)
+        before = decode_cursor(before, parse=float)
+        after = decode_cursor(after, parse=float)
+        forward = before is None
+        rows = self._ranked(before if before is not None else after, forward)
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        objects = self.queryset.in_bulk([pk for pk, rank in rows])
+        items = []
+        for pk, rank in rows:
+            if pk in objects:
+                objects[pk].search_rank = rank
+                items.append(objects[pk])
+        if forward:
+            return CursorPage(items, self, more, after is not None)
+        return CursorPage(items, self, True, more)
@@ -0,0 +1,101 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counts, db, invalidation, stats, thumbnails, timeline
+from .models import Comment, Follow, Group, Post
+
+
+# кэш инвалидирует модуль invalidation, здесь — остальные последствия
+# записи. При смене картинки нужны новые миниатюры
+invalidation.track_fields(Post, 'image')
+
+
+def _adjust_counts(index, groups):
+    # после коммита: откаченная запись не должна сдвигать счётчики лент,
+    # а заниженный счётчик обрезал бы последнюю страницу
+    def adjust():
+        if index:
+            counts.adjust_index(index)
+        for group_id, delta in groups.items():
+            counts.adjust_group(group_id, delta)
+    transaction.on_commit(adjust)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out_post.delay(instance.pk)
+        stats.adjust(instance.author_id, posts=1)
+        _adjust_counts(1, {instance.group_id: 1})
+    else:
+        previous = invalidation.previous(instance, 'group_id')
+        if previous != instance.group_id:
+            _adjust_counts(0, {previous: -1, instance.group_id: 1})
+    image = instance.image.name if instance.image else None
+    if image and image != invalidation.previous(instance, 'image'):
+        transaction.on_commit(lambda: thumbnails.generate.delay(image))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    timeline.refresh_followers.delay(instance.author_id)
+    stats.adjust(instance.author_id, posts=-1)
+    _adjust_counts(-1, {instance.group_id: -1})
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F('comment_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1
+    )
+
+
+def _touch_group_posts(group):
+    # название и ссылка группы есть на карточках её постов, а ключ
+    # карточки держится на Post.modified
+    Post.objects.filter(group_id=group.pk).update(modified=timezone.now())
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if invalidation.group_renamed(instance):
+        _touch_group_posts(instance)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # до того, как удаление обнулит Post.group
+    _touch_group_posts(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill_follow.delay(instance.user_id, instance.author_id)
+        stats.adjust(instance.author_id, followers=1)
+        stats.adjust(instance.user_id, following=1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    timeline.remove(instance.user_id, instance.author_id)
+    stats.adjust(instance.author_id, followers=-1)
+    stats.adjust(instance.user_id, following=-1)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        db.apply_pragmas(connection.cursor())
@@ -0,0 +1,108 @@
+"""Защита от «набега» на кэш для фрагментов шаблонов и целых страниц.
+
+Значение хранится в конверте (value, fresh_until, build_time) дольше
+своего таймаута на CACHE_STALE_GRACE секунд. Когда срок свежести
+прошёл, пересобирает ключ только запрос, взявший короткую блокировку
+(cache.add), а остальные до конца пересборки получают старое значение.
+Горячие ключи пересобираются заранее: чем ближе конец срока и чем
+дольше сборка, тем вероятнее досрочная пересборка (XFetch, Vattani et
+al.). Если значения нет совсем, например после смены версии области,
+остальные запросы недолго ждут результат того, кто его собирает.
+"""
+import math
+import random
+import time
+
+from django.conf import settings
+
+
+LOCK_KEY = '{}:lock'
+POLL_INTERVAL = 0.05
+
+
+class Lookup:
+    """Результат read(): значение (или None) и нужно ли его пересобрать.
+
+    Если rebuild истинно, вызывающий собирает значение и отдаёт его
+    write(); взятую блокировку (locked) он снимает release() в любом
+    случае.
+    """
+
+    def __init__(self, value, rebuild, locked=False):
+        self.value = value
+        self.rebuild = rebuild
+        self.locked = locked
+
+
+def _expired(fresh_until, build_time, now):
+    if fresh_until is None:
+        return False
+    beta = settings.CACHE_EARLY_REFRESH_BETA
+    # -log(random()) > 0: с вероятностью, растущей к концу срока,
+    # ключ считается устаревшим чуть раньше
+    early = build_time * beta * -math.log(1.0 - random.random())
+    return now + early >= fresh_until
+
+
+def _lock(cache, key):
+    return cache.add(LOCK_KEY.format(key), 1, settings.CACHE_LOCK_TIMEOUT)
+
+
+def release(cache, key):
+    cache.delete(LOCK_KEY.format(key))
+
+
+def _envelope(cache, key):
+    envelope = cache.get(key)
+    # под теми же ключами могут лежать значения, записанные без конверта
+    # (встроенным {% cache %} до перехода на этот модуль) — это промах
+    if isinstance(envelope, tuple) and len(envelope) == 3:
+        return envelope
+    return None
+
+
+def read(cache, key):
+    envelope = _envelope(cache, key)
+    if envelope is not None:
+        value, fresh_until, build_time = envelope
+        if not _expired(fresh_until, build_time, time.time()):
+            return Lookup(value, rebuild=False)
+        if _lock(cache, key):
+            return Lookup(None, rebuild=True, locked=True)
+        # ключ уже пересобирает другой запрос
+        return Lookup(value, rebuild=False)
+    if _lock(cache, key):
+        return Lookup(None, rebuild=True, locked=True)
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        envelope = _envelope(cache, key)
+        if envelope is not None:
+            return Lookup(envelope[0], rebuild=False)
+    # сборщик не успел: собираем сами, без блокировки
+    return Lookup(None, rebuild=True)
+
+
+def write(cache, key, value, timeout, build_time):
+    """Сохраняет значение на timeout секунд свежести (None — навсегда)."""
+    if timeout is None:
+        fresh_until, stored = None, None
+    else:
+        fresh_until = time.time() + timeout
+        stored = timeout + settings.CACHE_STALE_GRACE
+    cache.set(key, (value, fresh_until, build_time), stored)
+
+
+def get_or_build(cache, key, build, timeout):
+    """Значение из кэша или build(); сборку ключа ведёт один запрос."""
+    lookup = read(cache, key)
+    if not lookup.rebuild:
+        return lookup.value
+    started = time.perf_counter()
+    try:
+        value = build()
+        write(cache, key, value, timeout, time.perf_counter() - started)
+    finally:
+        if lookup.locked:
+            release(cache, key)
+    return value
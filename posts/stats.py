@@ -0,0 +1,80 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+from .routers import PRIMARY
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def counted_users():
+    """Пользователи с посчитанными с нуля posts/followers/following."""
+    return User.objects.annotate(
+        posts_total=_count(Post.objects, 'author'),
+        followers_total=_count(Follow.objects, 'author'),
+        following_total=_count(Follow.objects, 'user'),
+    )
+
+
+def stats_from_user(user):
+    return UserStats(
+        user_id=user.pk,
+        posts=user.posts_total,
+        followers=user.followers_total,
+        following=user.following_total,
+    )
+
+
+def rebuild(user_id):
+    # считаем по основной базе: отставшие счётчики реплики, записанные
+    # в основную, уже не исправились бы — дальше к ним только прибавляют
+    user = counted_users().using(PRIMARY).get(pk=user_id)
+    stats = stats_from_user(user)
+    try:
+        with transaction.atomic(using=PRIMARY):
+            stats.save(force_insert=True, using=PRIMARY)
+    except IntegrityError:
+        # строку успел создать параллельный запрос, или её ещё нет
+        # на реплике
+        stats = UserStats.objects.using(PRIMARY).get(pk=user_id)
+    return stats
+
+
+def get_stats(user):
+    """Строка статистики пользователя; при отсутствии считается заново."""
+    try:
+        return UserStats.objects.get(pk=user.pk)
+    except UserStats.DoesNotExist:
+        return rebuild(user.pk)
+
+
+def adjust(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя на deltas."""
+    updated = UserStats.objects.filter(pk=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    # строки ещё нет: rebuild посчитает уже с учётом изменения. Убыль
+    # без строки пропускаем — её пересчитает первое чтение, а при
+    # каскадном удалении пользователя строку создавать нельзя
+    growing = any(delta > 0 for delta in deltas.values())
+    if not updated and growing and User.objects.filter(pk=user_id).exists():
+        rebuild(user_id)
+
+
+def recount_comments(post_ids):
+    """Пересчитывает Post.comment_count для постов post_ids одним запросом."""
+    Post.objects.filter(pk__in=post_ids).update(
+        comment_count=_count(Comment.objects, 'post')
+    )
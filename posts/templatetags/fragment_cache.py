@@ -0,0 +1,69 @@
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template import TemplateSyntaxError, VariableDoesNotExist
+from django.templatetags import cache as cache_tags
+
+from posts import stampede
+
+register = template.Library()
+
+
+class FragmentCacheNode(cache_tags.CacheNode):
+    """{% cache %} с одной пересборкой ключа и отдачей старого значения.
+
+    Синтаксис и ключи фрагментов те же, что у встроенного тега, хранение
+    идёт через posts.stampede.
+    """
+
+    def render(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except VariableDoesNotExist:
+            raise TemplateSyntaxError(
+                f'"cache" tag got an unknown variable: '
+                f'{self.expire_time_var.var!r}'
+            )
+        if expire_time is not None:
+            try:
+                expire_time = int(expire_time)
+            except (ValueError, TypeError):
+                raise TemplateSyntaxError(
+                    f'"cache" tag got a non-integer timeout value: '
+                    f'{expire_time!r}'
+                )
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return stampede.get_or_build(
+            self._fragment_cache(context),
+            make_template_fragment_key(self.fragment_name, vary_on),
+            lambda: self.nodelist.render(context),
+            expire_time,
+        )
+
+    def _fragment_cache(self, context):
+        if self.cache_name:
+            cache_name = self.cache_name.resolve(context)
+            try:
+                return caches[cache_name]
+            except InvalidCacheBackendError:
+                raise TemplateSyntaxError(
+                    f'Invalid cache name specified for cache tag: '
+                    f'{cache_name!r}'
+                )
+        try:
+            return caches['template_fragments']
+        except InvalidCacheBackendError:
+            return caches['default']
+
+
+@register.tag('cache')
+def do_cache(parser, token):
+    """Тот же {% cache %}, что в {% load cache %}, с защитой от набега."""
+    node = cache_tags.do_cache(parser, token)
+    return FragmentCacheNode(
+        node.nodelist,
+        node.expire_time_var,
+        node.fragment_name,
+        node.vary_on,
+        node.cache_name,
+    )
@@ -0,0 +1,44 @@
+"""Окружение тестов: общее для pytest и manage.py test."""
+import contextlib
+import copy
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+@contextlib.contextmanager
+def isolated_storage():
+    """Кэш и загрузки тестов — во временном каталоге.
+
+    Иначе cache.clear() в тестах очищал бы кэш запущенного сервера
+    разработки, а параллельные прогоны мешали бы друг другу.
+    """
+    directory = tempfile.mkdtemp(prefix='yatube-tests-')
+    caches = copy.deepcopy(settings.CACHES)
+    caches['default']['LOCATION'] = os.path.join(
+        directory, 'cache', 'cache.sqlite3'
+    )
+    try:
+        with override_settings(
+            CACHES=caches, MEDIA_ROOT=os.path.join(directory, 'media')
+        ):
+            yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class IsolatedStorageRunner(DiscoverRunner):
+    """TEST_RUNNER для manage.py test с isolated_storage на весь прогон."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._storage = isolated_storage()
+        self._storage.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._storage.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
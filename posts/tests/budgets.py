@@ -0,0 +1,41 @@
+"""Бюджеты SQL-запросов для страниц из posts/urls.py.
+
+Бюджет — сколько запросов страница делает при холодном кэше на
+наборе данных из нескольких авторов, постов и комментариев. Число не
+должно зависеть от размера страницы, так что выход за бюджет почти
+всегда означает новый N+1.
+"""
+
+QUERY_BUDGETS = {
+    'index': 4,
+    'follow_index': 5,
+    'group': 6,
+    'new_post': 3,
+    'search': 4,
+    'profile': 8,
+    'post': 6,
+    'post_comments': 5,
+    'add_comment': 6,
+    'post_edit': 5,
+    'profile_follow': 12,
+    'profile_unfollow': 8,
+    # /404/ перехватывает маршрут профиля, запрос к нему — это профиль
+    'response_404': 4,
+}
+
+
+class QueryBudgetMixin:
+    """assertWithinBudget для TestCase: сверяет ответ с QUERY_BUDGETS.
+
+    Число запросов берётся из метрик RequestMetricsMiddleware, то есть
+    учитывает все middleware и все базы, а не только представление.
+    """
+
+    def assertWithinBudget(self, response):
+        name = response.wsgi_request.resolver_match.url_name
+        self.assertIn(name, QUERY_BUDGETS, f'Нет бюджета для {name}')
+        queries = response.wsgi_request.metrics.queries
+        budget = QUERY_BUDGETS[name]
+        self.assertLessEqual(
+            queries, budget, f'{name}: {queries} SQL-запросов, бюджет {budget}'
+        )
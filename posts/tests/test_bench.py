@@ -0,0 +1,91 @@
+import json
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from posts.bench import percentile, summarize
+from posts.models import Comment, Follow, Post, TimelineEntry, UserStats
+
+
+class SummarizeTests(TestCase):
+
+    def test_percentiles(self):
+        latencies = [number / 1000 for number in range(1, 101)]
+        summary = summarize(latencies, elapsed=2)
+        self.assertEqual(summary['requests'], 100)
+        self.assertEqual(summary['p50_ms'], 51)
+        self.assertEqual(summary['p99_ms'], 100)
+        self.assertEqual(summary['throughput_rps'], 50)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+
+class SeedBenchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def seed(self, **options):
+        defaults = {
+            'users': 30, 'posts': 200, 'comments': 100, 'groups': 3,
+            'follows': 5, 'batch_size': 50,
+        }
+        defaults.update(options)
+        call_command('seed_bench', stdout=StringIO(), **defaults)
+
+    def test_sizes_and_counters(self):
+        """Заданные объёмы создаются, счётчики и ленты согласованы"""
+        self.seed()
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts', flat=True)), 200
+        )
+        self.assertEqual(
+            sum(UserStats.objects.values_list('following', flat=True)),
+            Follow.objects.count(),
+        )
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user_id).filter(
+                author=follow.author_id
+            ).count(),
+            Post.objects.filter(author=follow.author_id).count(),
+        )
+        post = Post.objects.order_by('-comment_count').first()
+        self.assertEqual(post.comments.count(), post.comment_count)
+
+    def test_refuses_second_run(self):
+        self.seed(users=2, posts=1, comments=0)
+        with self.assertRaises(CommandError):
+            self.seed(users=2, posts=1, comments=0)
+
+
+class RunBenchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        call_command(
+            'seed_bench', users=10, posts=50, comments=20, groups=2,
+            follows=3, stdout=StringIO(),
+        )
+
+    def test_reports_json(self):
+        """Отчёт в JSON: сценарии с перцентилями и без ошибок"""
+        out = StringIO()
+        call_command(
+            'run_bench', requests=2, warmup=0, stdout=out, stderr=StringIO()
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['mode'], 'client')
+        self.assertEqual(report['meta']['dataset']['posts'], 50)
+        for name in ('index', 'group', 'profile', 'post', 'follow_index',
+                     'new_post', 'add_comment', 'follow'):
+            with self.subTest(scenario=name):
+                result = report['scenarios'][name]
+                self.assertEqual(result['requests'], 2)
+                self.assertEqual(result['errors'], 0)
+                self.assertIn('p95_ms', result)
+                self.assertIn('throughput_rps', result)
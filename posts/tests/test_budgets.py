@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import urls
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.budgets import QUERY_BUDGETS, QueryBudgetMixin
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        authors = [
+            User.objects.create(username=f'author{number}')
+            for number in range(3)
+        ]
+        cls.author = authors[0]
+        for author in authors[1:]:
+            Follow.objects.create(user=cls.reader, author=author)
+        for number in range(12):
+            author = authors[number % len(authors)]
+            post = Post.objects.create(
+                text=f'Пост про погоду {number}', author=author,
+                group=cls.group,
+            )
+            for commenter in authors:
+                Comment.objects.create(
+                    post=post, author=commenter, text='Комментарий'
+                )
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_every_url_has_budget(self):
+        names = {
+            pattern.name for pattern in urls.urlpatterns if pattern.name
+        }
+        self.assertEqual(names - set(QUERY_BUDGETS), set())
+
+    def test_pages_within_budget(self):
+        post_kwargs = {
+            'username': self.post.author.username, 'post_id': self.post.pk,
+        }
+        author = {'username': self.author.username}
+        requests = [
+            ('get', reverse('index'), {}),
+            ('get', reverse('follow_index'), {}),
+            ('get', reverse('group', kwargs={'slug': 'group'}), {}),
+            ('get', reverse('new_post'), {}),
+            ('get', reverse('search'), {'q': 'погод'}),
+            ('get', reverse('profile', kwargs=author), {}),
+            ('get', reverse('post', kwargs=post_kwargs), {}),
+            ('get', reverse('post_comments', kwargs=post_kwargs), {}),
+            ('post', reverse('add_comment', kwargs=post_kwargs),
+             {'text': 'Ещё комментарий'}),
+            ('get', reverse('profile_follow', kwargs=author), {}),
+            ('get', reverse('profile_unfollow', kwargs=author), {}),
+        ]
+        for method, url, data in requests:
+            with self.subTest(url=url):
+                cache.clear()
+                response = getattr(self.client, method)(url, data)
+                self.assertWithinBudget(response)
+
+    def test_post_edit_within_budget(self):
+        self.client.force_login(self.post.author)
+        response = self.client.get(reverse('post_edit', kwargs={
+            'username': self.post.author.username, 'post_id': self.post.pk,
+        }))
+        self.assertWithinBudget(response)
+
+
+class MetricsHeadersTests(TestCase):
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        response = self.client.get(reverse('index'))
+        self.assertIn('X-Metrics-Queries', response)
+        self.assertIn('X-Metrics-DB-Time', response)
+        self.assertIn('X-Metrics-Cache', response)
+        self.assertIn('X-Metrics-Render-Time', response)
+
+    def test_no_headers_in_production(self):
+        response = self.client.get(reverse('index'))
+        self.assertNotIn('X-Metrics-Queries', response)
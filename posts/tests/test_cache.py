@@ -1,38 +1,159 @@
 from django.core.cache import cache
-from django.core.cache.utils import make_template_fragment_key
-from django.test import TransactionTestCase, Client
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Group, Post, User
+from posts import caching
+from posts.models import Comment, Group, Post, User
 
 
 class CachIndexTest(TransactionTestCase):
-    @classmethod
-    def setUpClass(cls):
-        super().setUpClass()
-        cls.key = make_template_fragment_key('index_page')
-        cls.user = User.objects.create_user(username='User-1')
-        cls.authorized_client = Client()        
-        cls.authorized_client.force_login(cls.user)
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='User-1')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
 
     def test_cache(self):
         # Лента "до"
         response_get_before = self.authorized_client.get(reverse('index'))
+        # Повторный запрос отдаётся из кэша
+        response_cached = self.authorized_client.get(reverse('index'))
+        self.assertEqual(response_get_before.content, response_cached.content)
         # Создаем новый пост
         new_group = Group(title='Тестовая группа', slug='testgroup')
         new_group.save()
-        new_post = Post.objects.create(
-            text='Новый пост', 
+        Post.objects.create(
+            text='Новый пост',
             author=self.user,
             group=new_group,
         )
-        # Лента "после"
+        # Лента "после": версия ленты сменилась, пост виден сразу
         response_get_after = self.authorized_client.get(reverse('index'))
-        # Сравнение лент
-        self.assertEqual(response_get_before.content, response_get_after.content)
-        # Чистим кэш
+        self.assertNotEqual(response_get_before.content, response_get_after.content)
+        self.assertContains(response_get_after, 'Новый пост')
+
+    def test_write_keeps_unrelated_keys(self):
+        """Публикация поста не стирает чужие ключи кэша"""
+        cache.set('unrelated', 'value')
+        self.authorized_client.post(reverse('new_post'), {'text': 'Пост'})
+        self.assertEqual(cache.get('unrelated'), 'value')
+
+    def test_targeted_versions(self):
+        """Запись меняет версии только тех областей, где виден пост"""
+        other = User.objects.create_user(username='User-2')
+        group = Group.objects.create(title='Группа', slug='group')
+        other_scope = caching.scope_for_profile(other.pk)
+        other_version = caching.get_version(other_scope)
+        index_version = caching.get_version(caching.scope_for_index())
+        group_version = caching.get_version(caching.scope_for_group(group.pk))
+        post = Post.objects.create(text='Пост', author=self.user)
+        self.assertNotEqual(
+            caching.get_version(caching.scope_for_index()), index_version
+        )
+        self.assertEqual(caching.get_version(other_scope), other_version)
+        post.group = group
+        post.save()
+        self.assertNotEqual(
+            caching.get_version(caching.scope_for_group(group.pk)),
+            group_version,
+        )
+        post_version = caching.get_version(caching.scope_for_post(post.pk))
+        Comment.objects.create(post=post, author=other, text='Комментарий')
+        self.assertNotEqual(
+            caching.get_version(caching.scope_for_post(post.pk)), post_version
+        )
+
+
+class AnonymousPageCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='User-1')
+        self.post = Post.objects.create(text='Первый пост', author=self.user)
+        self.client = Client()
+
+    def test_anonymous_page_served_from_cache(self):
+        """Повторная анонимная страница отдаётся без запросов к БД"""
+        first = self.client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('index'))
+        self.assertEqual(first.content, second.content)
+
+    def test_write_invalidates_page(self):
+        self.client.get(reverse('index'))
+        Post.objects.create(text='Второй пост', author=self.user)
+        self.assertContains(self.client.get(reverse('index')), 'Второй пост')
+
+    def test_query_string_is_part_of_key(self):
+        for number in range(12):
+            Post.objects.create(text=f'Пост {number}', author=self.user)
+        first = self.client.get(reverse('index'))
+        second = self.client.get(reverse('index'), {'page': 2})
+        self.assertNotEqual(first.content, second.content)
+
+    def test_authenticated_bypass(self):
+        """Страницы авторизованных пользователей в кэш не попадают"""
+        self.client.force_login(self.user)
+        self.client.get(reverse('index'))
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('index'))
+        self.assertTrue(
+            any('posts_post' in query['sql'] for query in context)
+        )
+
+
+class PostCardCacheTest(TestCase):
+
+    def setUp(self):
         cache.clear()
-        # Лента после очистки кэша
-        response_cach_cleared = self.authorized_client.get(reverse('index'))
-        self.assertNotEqual(response_get_before.content, response_cach_cleared.content)
-        
\ No newline at end of file
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(
+            text='Первый текст', author=self.author
+        )
+        self.client.force_login(self.reader)
+
+    def test_card_shared_between_pages(self):
+        """Карточка, отрисованная в ленте, переиспользуется в профиле"""
+        self.client.get(reverse('index'))
+        # update() не трогает modified: ключ карточки прежний
+        Post.objects.filter(pk=self.post.pk).update(text='Тайный текст')
+        response = self.client.get(
+            reverse('profile', kwargs={'username': 'author'})
+        )
+        self.assertContains(response, 'Первый текст')
+
+    def test_card_rerendered_on_change(self):
+        self.client.get(reverse('index'))
+        self.post.text = 'Второй текст'
+        self.post.save()
+        self.assertContains(self.client.get(reverse('index')), 'Второй текст')
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertContains(
+            self.client.get(reverse('index')), 'Комментариев: 1'
+        )
+
+    def test_edit_link_only_for_author(self):
+        author = Client()
+        author.force_login(self.author)
+        self.assertContains(author.get(reverse('index')), 'Редактировать')
+        self.assertNotContains(
+            self.client.get(reverse('index')), 'Редактировать'
+        )
+
+    def test_post_edit_updates_modified(self):
+        author = Client()
+        author.force_login(self.author)
+        modified = self.post.modified
+        author.post(
+            reverse('post_edit', kwargs={
+                'username': 'author', 'post_id': self.post.pk,
+            }),
+            {'text': 'Исправленный текст'},
+        )
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.modified, modified)
@@ -0,0 +1,121 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from posts.cache_backends import TwoTierCache
+
+
+OTHER_PID = os.getpid() + 100000
+
+
+class TwoTierCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, sync_interval=0, **options):
+        return TwoTierCache(self.location, {
+            'OPTIONS': {
+                'SYNC_INTERVAL': sync_interval, 'LOCAL_TIMEOUT': 60,
+                **options,
+            },
+        })
+
+    def in_other_process(self, action):
+        """Выполняет action от имени другого процесса с тем же файлом."""
+        with mock.patch('os.getpid', return_value=OTHER_PID):
+            return action(self.make_cache())
+
+    def test_basic_operations(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.assertEqual(
+            self.cache.get_many(['key', 'new', 'missing']),
+            {'key': {'value': 1}, 'new': 'value'},
+        )
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('new'))
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.get('counter'), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_value_is_missing(self):
+        self.cache.set('key', 'value', timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+
+    def test_local_tier_serves_repeated_reads(self):
+        self.cache.set('key', 'value')
+        cache = self.make_cache(sync_interval=3600)
+        with mock.patch.object(
+            TwoTierCache, '_db', side_effect=AssertionError
+        ):
+            self.assertEqual(cache.get('key'), 'value')
+
+    def test_shared_between_processes(self):
+        self.cache.set('key', 'value')
+        value = self.in_other_process(lambda cache: cache.get('key'))
+        self.assertEqual(value, 'value')
+
+    def test_write_in_other_process_invalidates_local_copy(self):
+        self.cache.set('key', 'old')
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.get('key'), 'old')
+        self.in_other_process(lambda c: c.set('key', 'new'))
+        self.in_other_process(lambda c: c.incr('counter'))
+        self.assertEqual(self.cache.get('key'), 'new')
+        self.assertEqual(self.cache.get('counter'), 2)
+        self.in_other_process(lambda c: c.delete('key'))
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_clear_in_other_process(self):
+        self.cache.set('key', 'value')
+        self.in_other_process(lambda c: c.clear())
+        self.assertIsNone(self.cache.get('key'))
+
+    def count_rows(self, table):
+        with sqlite3.connect(self.location) as db:
+            return db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    def test_cleanup_runs_every_n_writes(self):
+        cache = self.make_cache(CLEANUP_EVERY=3, JOURNAL_TTL=0)
+        cache.set('expired', 'value', timeout=0.01)
+        time.sleep(0.05)
+        cache.set('key', 'value')
+        self.assertEqual(self.count_rows('cache'), 2)
+        self.assertEqual(self.count_rows('invalidations'), 2)
+        cache.set('other', 'value')
+        self.assertEqual(self.count_rows('cache'), 2)
+        # остаётся только сообщение о самой последней записи
+        self.assertEqual(self.count_rows('invalidations'), 1)
+
+    def test_cleanup_uses_indexes(self):
+        self.cache.set('key', 'value')
+        queries = [
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires < 1',
+            'DELETE FROM invalidations WHERE created < 1',
+        ]
+        with sqlite3.connect(self.location) as db:
+            for query in queries:
+                plan = ' '.join(
+                    row[-1]
+                    for row in db.execute(f'EXPLAIN QUERY PLAN {query}')
+                )
+                self.assertIn('USING', plan, query)
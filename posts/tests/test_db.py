@@ -0,0 +1,35 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+
+class SqlitePragmaTests(TestCase):
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_set_on_connect(self):
+        """Прагмы из настроек выставлены на соединении Django"""
+        for name in ('busy_timeout', 'cache_size'):
+            with self.subTest(pragma=name):
+                self.assertEqual(
+                    self.pragma(name), settings.SQLITE_PRAGMAS[name]
+                )
+        # 1 — NORMAL
+        self.assertEqual(self.pragma('synchronous'), 1)
+
+
+class BenchSqliteTests(SimpleTestCase):
+
+    def test_reports_both_profiles(self):
+        out = StringIO()
+        call_command(
+            'bench_sqlite', duration=0.1, readers=1, rows=100, stdout=out
+        )
+        self.assertIn('default:', out.getvalue())
+        self.assertIn('production:', out.getvalue())
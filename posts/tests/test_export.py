@@ -0,0 +1,96 @@
+import datetime as dt
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def read(directory, name):
+    with gzip.open(os.path.join(directory, f'{name}.jsonl.gz'), 'rt') as stream:
+        return [json.loads(line) for line in stream]
+
+
+class ExportContentTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        self.reader = User.objects.create(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        self.posts = [
+            Post.objects.create(text=f'Пост {n}', author=self.author, group=group)
+            for n in range(5)
+        ]
+        Comment.objects.create(post=self.posts[0], author=self.reader, text='К')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.directory = tempfile.mkdtemp()
+        self.state = os.path.join(self.directory, 'state.json')
+
+    def export(self):
+        call_command(
+            'export_content', output=self.directory, state=self.state,
+            stdout=StringIO(),
+        )
+
+    def test_export_and_watermark(self):
+        """Повторная выгрузка по метке содержит только новые записи"""
+        self.export()
+        posts = read(self.directory, 'posts')
+        self.assertEqual(
+            [post['id'] for post in posts], [post.pk for post in self.posts]
+        )
+        self.assertEqual(posts[0]['group'], 'group')
+        self.assertEqual(len(read(self.directory, 'comments')), 1)
+        self.assertEqual(
+            read(self.directory, 'follows'),
+            [{'type': 'follow', 'user': 'reader', 'author': 'author'}],
+        )
+        self.export()
+        self.assertEqual(read(self.directory, 'posts'), [])
+        new_post = Post.objects.create(text='Новый', author=self.author)
+        self.export()
+        self.assertEqual(
+            [post['id'] for post in read(self.directory, 'posts')],
+            [new_post.pk],
+        )
+
+    def test_streams_keep_own_watermarks(self):
+        """Комментарий старее последнего поста не теряется"""
+        now = timezone.now()
+        Post.objects.filter(pk=self.posts[-1].pk).update(pub_date=now)
+        Comment.objects.update(created=now - dt.timedelta(hours=2))
+        self.export()
+        late = Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Поздний'
+        )
+        # запись между метками потоков: новее прошлых комментариев,
+        # но старее последнего выгруженного поста
+        Comment.objects.filter(pk=late.pk).update(
+            created=now - dt.timedelta(hours=1)
+        )
+        self.export()
+        self.assertEqual(read(self.directory, 'posts'), [])
+        self.assertEqual(
+            [comment['id'] for comment in read(self.directory, 'comments')],
+            [late.pk],
+        )
+
+    def test_round_trip_with_import(self):
+        self.export()
+        Post.objects.all().delete()
+        for name in ('groups', 'posts', 'comments'):
+            call_command(
+                'import_posts',
+                os.path.join(self.directory, f'{name}.jsonl.gz'),
+                stdout=StringIO(),
+            )
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).comment_count, 1)
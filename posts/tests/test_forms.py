@@ -0,0 +1,25 @@
+from django.test import TestCase
+
+from users.forms import CreationForm, reserved_usernames
+
+
+class ReservedUsernameTests(TestCase):
+
+    def form(self, username):
+        return CreationForm({
+            'username': username,
+            'password1': 'Sup3r-secret-pass',
+            'password2': 'Sup3r-secret-pass',
+        })
+
+    def test_reserved_names_come_from_urls(self):
+        names = reserved_usernames()
+        for name in ('search', 'new', 'follow', 'group', 'auth', 'admin'):
+            with self.subTest(name=name):
+                self.assertIn(name, names)
+
+    def test_signup_rejects_url_names(self):
+        """Пользователь search не смог бы открыть свою страницу"""
+        self.assertFalse(self.form('search').is_valid())
+        self.assertIn('username', self.form('search').errors)
+        self.assertTrue(self.form('searcher').is_valid())
@@ -1,10 +1,22 @@
+import io
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.http import response
 from django.test import Client
-from django.test import TestCase
+from django.template.loader import get_template
+from django.test import TestCase, TransactionTestCase
 from django.urls import reverse
 
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.kvstores import cached_db_kvstore
+
+from posts import thumbnails
+from posts.cache_backends import TwoTierCache
+from posts.kvstore import LRUCache
 from posts.models import Group
 from posts.models import Post
 
@@ -189,3 +201,85 @@ class ImageTests(TestCase):
             'Загрузите правильное изображение. ' 
             'Файл, который вы загрузили, поврежден или не является изображением.'
         )
+
+
+class EagerThumbnailTests(TransactionTestCase):
+
+    def test_thumbnails_generated_on_save(self):
+        """Миниатюры создаются при сохранении поста, а не при показе"""
+        author = User.objects.create(username='Testuser1')
+        uploaded = SimpleUploadedFile(
+            name='small.gif',
+            content=(
+                b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21'
+                b'\xf9\x04\x01\x00\x00\x00\x00\x2c\x00\x00\x00\x00\x01\x00'
+                b'\x01\x00\x00\x02\x01\x00\x00\x3b'
+            ),
+            content_type='image/gif'
+        )
+        with mock.patch('posts.thumbnails.get_thumbnail') as get_thumbnail:
+            post = Post.objects.create(
+                text='Пост', author=author, image=uploaded
+            )
+            get_thumbnail.assert_called_once_with(
+                post.image.name, '960x339', crop='center', upscale=True
+            )
+            post.text = 'Новый текст'
+            post.save()
+            get_thumbnail.assert_called_once()
+        post.image.delete(save=False)
+
+
+class ThumbnailPrefetchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.local.clear()
+        author = User.objects.create(username='Testuser1')
+        content = io.BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(content, 'JPEG')
+        for number in range(10):
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=author,
+                image=SimpleUploadedFile(
+                    f'image_{number}.jpg', content.getvalue()
+                ),
+            )
+        self.posts = list(
+            Post.objects.select_related('author', 'group').order_by('pk')
+        )
+        # миниатюры создаёт сам sorl; пересчёт пикселей к проверке ключей
+        # не относится
+        with mock.patch.object(
+            default.engine, '_scale', side_effect=lambda image, *size: image
+        ):
+            for post in self.posts:
+                thumbnails.generate(post.image.name)
+
+    def test_render_after_prefetch(self):
+        """После подгрузки лента рисуется без обращений к KV-хранилищу"""
+        default.kvstore.local.clear()
+        cache.clear()
+        # промахи кэша дописываются в него одним set_many, а не по ключу
+        with self.assertNumQueries(2), mock.patch.object(
+            TwoTierCache, 'set', side_effect=AssertionError('cache.set')
+        ):
+            thumbnails.prefetch(self.posts)
+        template = get_template('post_item.html')
+        with mock.patch.object(
+            cached_db_kvstore.KVStore, '_get_raw',
+            side_effect=AssertionError('запись миниатюры не подгружена'),
+        ):
+            for post in self.posts:
+                html = template.render({'post': post})
+                self.assertIn('<img', html)
+
+    def test_lru_eviction(self):
+        lru = LRUCache(maxsize=2, timeout=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
@@ -0,0 +1,139 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                          UserStats)
+
+
+class ImportPostsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create(username='reader')
+
+    def run_import(self, content, suffix, *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix) as source:
+            source.write(content)
+            source.flush()
+            out = StringIO()
+            call_command('import_posts', source.name, *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_jsonl(self):
+        """Импорт создаёт записи и обновляет ленты и счётчики"""
+        records = [
+            {'type': 'group', 'slug': 'cats', 'title': 'Котики'},
+            {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+            {
+                'type': 'post', 'id': 100, 'text': 'Старый пост',
+                'author': 'writer', 'group': 'cats',
+                'pub_date': '2015-01-02T03:04:05+00:00',
+            },
+            {
+                'type': 'comment', 'post': 100, 'author': 'reader',
+                'text': 'Комментарий', 'created': '2015-01-03T00:00:00+00:00',
+            },
+            {'type': 'comment', 'post': 999, 'author': 'reader', 'text': '?'},
+        ]
+        output = self.run_import(
+            '\n'.join(json.dumps(record) for record in records),
+            '.jsonl', '--create-users', '--batch-size', '2',
+        )
+        self.assertIn('строк/с', output)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.group, Group.objects.get(slug='cats'))
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertTrue(Follow.objects.filter(author=post.author).exists())
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(UserStats.objects.get(pk=post.author_id).posts, 1)
+        self.assertIn('comment: загружено 1, пропущено 1', output)
+
+    def test_import_csv(self):
+        content = 'text,author,pub_date\nПервый,reader,\nВторой,reader,\n'
+        self.run_import(content, '.csv', '--type', 'post')
+        self.assertEqual(self.reader.posts.count(), 2)
+        self.assertEqual(
+            len(set(self.reader.posts.values_list('pk', flat=True))), 2
+        )
+
+    def test_unknown_authors_skipped_without_flag(self):
+        output = self.run_import(
+            json.dumps({'type': 'post', 'text': 'Пост', 'author': 'ghost'}),
+            '.jsonl',
+        )
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('post: загружено 0, пропущено 1', output)
+
+    def test_bad_records_skipped(self):
+        """Плохие записи считаются пропущенными, а не роняют загрузку"""
+        author = User.objects.create(username='writer')
+        Post.objects.create(pk=100, text='Уже есть', author=author)
+        Follow.objects.create(user=self.reader, author=author)
+        records = [
+            {'type': 'group', 'title': 'Без адреса'},
+            {'type': 'post', 'id': 100, 'text': 'Дубль', 'author': 'writer'},
+            {'type': 'post', 'id': 'x', 'text': 'Ид', 'author': 'writer'},
+            {
+                'type': 'post', 'text': 'Нет группы', 'author': 'writer',
+                'group': 'missing',
+            },
+            {'type': 'post', 'id': 101, 'text': 'Новый', 'author': 'writer'},
+            {'type': 'comment', 'author': 'reader', 'text': 'Без поста'},
+            {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+        ]
+        output = self.run_import(
+            '\n'.join(json.dumps(record) for record in records), '.jsonl'
+        )
+        self.assertEqual(
+            list(Post.objects.values_list('pk', 'text')),
+            [(101, 'Новый'), (100, 'Уже есть')],
+        )
+        self.assertIn('group: загружено 0, пропущено 1', output)
+        self.assertIn('post: загружено 1, пропущено 3', output)
+        self.assertIn('comment: загружено 0, пропущено 1', output)
+        self.assertIn('follow: загружено 0, пропущено 1', output)
+
+    def test_bad_dates_skipped(self):
+        author = User.objects.create(username='writer')
+        Post.objects.create(pk=1, text='Пост', author=author)
+        records = [
+            {
+                'type': 'post', 'text': 'Вчера', 'author': 'writer',
+                'pub_date': 'yesterday',
+            },
+            {
+                'type': 'post', 'text': 'Тринадцатый месяц',
+                'author': 'writer', 'pub_date': '2020-13-45T00:00:00',
+            },
+            {'type': 'post', 'text': 'Без даты', 'author': 'writer'},
+            {
+                'type': 'comment', 'post': 1, 'author': 'reader',
+                'text': 'К', 'created': 'yesterday',
+            },
+            {
+                'type': 'comment', 'post': 1, 'author': 'reader',
+                'text': 'К', 'created': '2020-13-45T00:00:00',
+            },
+        ]
+        output = self.run_import(
+            '\n'.join(json.dumps(record) for record in records), '.jsonl'
+        )
+        self.assertEqual(
+            set(Post.objects.values_list('text', flat=True)),
+            {'Пост', 'Без даты'},
+        )
+        self.assertIn('post: загружено 1, пропущено 2', output)
+        self.assertIn('comment: загружено 0, пропущено 2', output)
+
+    def test_broken_line(self):
+        with self.assertRaisesMessage(CommandError, 'Строка 2'):
+            self.run_import('{"type": "group", "slug": "a"}\n{oops', '.jsonl')
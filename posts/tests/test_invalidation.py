@@ -0,0 +1,123 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import caching, invalidation
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class InvalidationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        self.reader = User.objects.create(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group
+        )
+
+    def versions(self, *scopes):
+        return caching.get_versions(*scopes)
+
+    def test_declared_dependency(self):
+        """Функция из depends_on получает объект и задаёт области"""
+        seen = []
+
+        @invalidation.depends_on(Group, track=('title',))
+        def group_menu(group):
+            seen.append(invalidation.previous(group, 'title'))
+            if invalidation.changed(group, 'title'):
+                yield 'group_menu'
+
+        self.addCleanup(invalidation._registry[Group].remove, group_menu)
+        before = caching.get_version('group_menu')
+        self.group.description = 'Описание'
+        self.group.save()
+        self.assertEqual(caching.get_version('group_menu'), before)
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertNotEqual(caching.get_version('group_menu'), before)
+        self.assertEqual(seen, ['Группа', 'Группа'])
+
+    def test_group_rename(self):
+        """Переименование группы обновляет карточки её постов"""
+        scopes = caching.post_scopes(self.post)
+        before = self.versions(*scopes)
+        modified = self.post.modified
+        self.group.title = 'Новое название'
+        self.group.save()
+        after = self.versions(*scopes)
+        for scope in scopes:
+            with self.subTest(scope=scope):
+                self.assertNotEqual(after[scope], before[scope])
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.modified, modified)
+
+    def test_group_description_only_touches_group(self):
+        index = caching.scope_for_index()
+        before = caching.get_version(index)
+        self.group.description = 'Описание'
+        self.group.save()
+        self.assertEqual(caching.get_version(index), before)
+
+    def test_group_delete(self):
+        scope = caching.scope_for_profile(self.author.pk)
+        before = caching.get_version(scope)
+        modified = self.post.modified
+        self.group.delete()
+        self.assertNotEqual(caching.get_version(scope), before)
+        self.post.refresh_from_db()
+        self.assertIsNone(self.post.group_id)
+        self.assertGreater(self.post.modified, modified)
+
+    def test_timeline_scopes(self):
+        """Состав ленты меняют подписка и новые посты, но не комментарии"""
+        timeline = caching.scope_for_timeline(self.reader.pk)
+        before = caching.get_version(timeline)
+        Follow.objects.create(user=self.reader, author=self.author)
+        followed = caching.get_version(timeline)
+        self.assertNotEqual(followed, before)
+        Comment.objects.create(post=self.post, author=self.reader, text='К')
+        self.assertEqual(caching.get_version(timeline), followed)
+        post = Post.objects.create(text='Ещё пост', author=self.author)
+        posted = caching.get_version(timeline)
+        self.assertNotEqual(posted, followed)
+        post.delete()
+        self.assertNotEqual(caching.get_version(timeline), posted)
+
+
+class FollowIndexEtagTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        self.reader = User.objects.create(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.post = Post.objects.create(text='Пост', author=self.author)
+        self.client.force_login(self.reader)
+        self.url = reverse('follow_index')
+
+    def assertEtagChanged(self, etag):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_reach_timeline(self):
+        """Пост, правка, комментарий и подписка меняют ETag ленты"""
+        etag = self.client.get(self.url)['ETag']
+        self.post.text = 'Правка'
+        self.post.save()
+        etag = self.assertEtagChanged(etag)
+        Comment.objects.create(post=self.post, author=self.reader, text='К')
+        etag = self.assertEtagChanged(etag)
+        Post.objects.create(text='Новый пост', author=self.author)
+        etag = self.assertEtagChanged(etag)
+        other = User.objects.create(username='other')
+        Follow.objects.create(user=self.reader, author=other)
+        self.assertEtagChanged(etag)
@@ -0,0 +1,78 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Post, User, UserStats
+
+
+class CommentCountTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.post = Post.objects.create(text='Пост', author=self.author)
+
+    def test_comment_count_follows_comments(self):
+        """Счётчик комментариев растёт при добавлении и падает при удалении"""
+        comments = [
+            Comment.objects.create(
+                post=self.post, author=self.author, text=f'Комментарий {n}'
+            )
+            for n in range(3)
+        ]
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 3)
+        comments[0].delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+    def test_post_save_keeps_comment_count(self):
+        """Сохранение поста через форму не затирает счётчик"""
+        stale = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(post=self.post, author=self.author, text='К')
+        self.client.force_login(self.author)
+        self.client.post(
+            f'/{self.author.username}/{stale.pk}/edit/',
+            {'text': 'Новый текст'},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'Новый текст')
+        self.assertEqual(self.post.comment_count, 1)
+
+
+class UserStatsTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.reader = User.objects.create(username='reader')
+
+    def test_stats_follow_writes(self):
+        """Счётчики профиля меняются вместе с постами и подписками"""
+        post = Post.objects.create(text='Пост', author=self.author)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        author_stats = UserStats.objects.get(pk=self.author.pk)
+        reader_stats = UserStats.objects.get(pk=self.reader.pk)
+        self.assertEqual(
+            (author_stats.posts, author_stats.followers), (1, 1)
+        )
+        self.assertEqual(reader_stats.following, 1)
+        follow.delete()
+        post.delete()
+        author_stats.refresh_from_db()
+        self.assertEqual(
+            (author_stats.posts, author_stats.followers), (0, 0)
+        )
+
+    def test_rebuild_command(self):
+        Post.objects.create(text='Пост', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.filter(pk=self.author.pk).update(posts=42)
+        call_command('rebuild_user_stats', stdout=StringIO())
+        stats = UserStats.objects.get(pk=self.author.pk)
+        self.assertEqual((stats.posts, stats.followers), (1, 1))
+
+    def test_deleting_user_keeps_stats_consistent(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.filter(pk=self.reader.pk).delete()
+        self.reader.delete()
+        self.assertEqual(UserStats.objects.get(pk=self.author.pk).followers, 0)
@@ -0,0 +1,137 @@
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import counts
+from posts.models import Group, Post, User
+from posts.pagination import CursorPaginator, decode_cursor, page_window
+
+
+class CursorPaginationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        self.client = Client()
+        for number in range(25):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+
+    def test_pages_do_not_overlap(self):
+        """Листание по курсору обходит всю ленту без пропусков и повторов"""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        seen = []
+        page = paginator.get_page()
+        while True:
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            page = paginator.get_page(after=page.next_cursor)
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list('pk', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_before_returns_previous_page(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.get_page()
+        second = paginator.get_page(after=first.next_cursor)
+        back = paginator.get_page(before=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_broken_cursor(self):
+        self.assertIsNone(decode_cursor('не-курсор'))
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        self.assertEqual(len(paginator.get_page(after='!!!')), 10)
+
+    def test_index_cursor_navigation(self):
+        """Ссылка «Следующая» на главной ведёт на страницу по курсору"""
+        response = self.client.get(reverse('index'))
+        next_cursor = response.context['page'].next_cursor
+        self.assertContains(response, f'?after={next_cursor}')
+        response = self.client.get(reverse('index'), {'after': next_cursor})
+        self.assertEqual(len(response.context['page']), 10)
+        self.assertTrue(response.context['page'].has_previous())
+        self.assertNotIn('count', response.context['paginator'].__dict__)
+
+
+class PageWindowTests(TestCase):
+
+    def window(self, number, total_pages):
+        paginator = Paginator(range(total_pages), 1)
+        return page_window(paginator.page(number), size=2)
+
+    def test_window(self):
+        self.assertEqual(self.window(1, 1), [1])
+        self.assertEqual(self.window(1, 4), [1, 2, 3, 4])
+        self.assertEqual(self.window(1, 100), [1, 2, 3, None, 100])
+        self.assertEqual(
+            self.window(50, 100), [1, None, 48, 49, 50, 51, 52, None, 100]
+        )
+        self.assertEqual(self.window(4, 100), [1, 2, 3, 4, 5, 6, None, 100])
+
+
+class CountedPaginationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        for number in range(45):
+            Post.objects.create(
+                text=f'Пост {number}', author=self.author,
+                group=self.group if number % 3 else None,
+            )
+
+    def test_links_only_around_current_page(self):
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['paginator'].num_pages, 5)
+        self.assertContains(response, '?page=3"')
+        self.assertNotContains(response, '?page=4"')
+        self.assertContains(response, '&hellip;')
+        self.assertContains(response, '?page=5"')
+
+    def test_count_from_cache(self):
+        """Повторная страница берёт число постов из кэша, а не COUNT(*)"""
+        self.client.get(reverse('index'), {'page': 2})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('index'), {'page': 3})
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in context)
+        )
+
+
+class CountAdjustmentTests(TransactionTestCase):
+    # счётчики сдвигаются после коммита, нужны настоящие транзакции
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.create(text='Пост', author=self.author, group=self.group)
+
+    def test_writes_adjust_counts(self):
+        self.assertEqual(counts.index(), 1)
+        self.assertEqual(counts.group(self.group.pk), 1)
+        post = Post.objects.create(text='Новый', author=self.author)
+        self.assertEqual(counts.index(), 2)
+        post.group = self.group
+        post.save()
+        self.assertEqual(counts.group(self.group.pk), 2)
+        post.delete()
+        self.assertEqual(counts.index(), 1)
+        self.assertEqual(counts.group(self.group.pk), 1)
+
+    def test_rollback_keeps_counts(self):
+        self.assertEqual(counts.index(), 1)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Post.objects.create(
+                text='Новый', author=self.author, group=self.group
+            )
+            raise RuntimeError
+        self.assertEqual(counts.index(), 1)
+        self.assertEqual(counts.group(self.group.pk), 1)
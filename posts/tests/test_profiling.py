@@ -0,0 +1,101 @@
+import marshal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import profiling
+from posts.models import Post, RequestProfile, User
+
+
+class ProfilingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='reader')
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_not_profiled_by_default(self):
+        self.client.get(reverse('index'), {'_profile': 1})
+        self.client.get(reverse('index'), HTTP_X_PROFILE='подделка')
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_signed_header(self):
+        """Подписанный заголовок сохраняет профиль и SQL запроса"""
+        url = reverse('profile', kwargs={'username': 'reader'})
+        self.client.get(url, HTTP_X_PROFILE=profiling.make_token())
+        saved = RequestProfile.objects.get()
+        self.assertEqual(saved.trigger, 'header')
+        self.assertEqual(saved.path, url)
+        self.assertEqual(saved.view_name, 'profile')
+        self.assertEqual(saved.status, 200)
+        self.assertGreater(saved.query_count, 0)
+        self.assertIn('posts_post', saved.sql)
+        self.assertIn('cumulative', saved.summary)
+        self.assertTrue(marshal.loads(bytes(saved.stats)))
+
+    def test_sql_params_not_saved(self):
+        """В профиль попадает текст SQL, но не значения параметров"""
+        self.client.post(
+            reverse('login'),
+            {'username': 'admin', 'password': 'password'},
+            HTTP_X_PROFILE=profiling.make_token(),
+        )
+        saved = RequestProfile.objects.get()
+        self.assertEqual(saved.status, 302)
+        self.assertIn('auth_user', saved.sql)
+        self.admin.refresh_from_db()
+        self.assertNotIn(self.admin.password, saved.sql)
+        self.assertNotIn(self.client.session.session_key, saved.sql)
+        self.assertNotIn("'admin'", saved.sql)
+
+    @override_settings(PROFILE_TOKEN_MAX_AGE=-1)
+    def test_expired_header(self):
+        self.client.get(
+            reverse('index'), HTTP_X_PROFILE=profiling.make_token()
+        )
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_query_flag_only_for_staff(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('index'), {'_profile': 1})
+        self.assertFalse(RequestProfile.objects.exists())
+        self.client.force_login(self.admin)
+        self.client.get(reverse('index'), {'_profile': 1})
+        self.assertEqual(RequestProfile.objects.get().trigger, 'query')
+
+    @override_settings(PROFILE_SAMPLE_RATE=1, PROFILE_KEEP=2)
+    def test_sampling_keeps_latest(self):
+        for _ in range(3):
+            self.client.get(reverse('index'))
+        self.assertEqual(RequestProfile.objects.count(), 2)
+        self.assertEqual(
+            set(RequestProfile.objects.values_list('trigger', flat=True)),
+            {'sample'},
+        )
+
+    def test_admin_lists_profiles(self):
+        self.client.get(
+            reverse('index'), HTTP_X_PROFILE=profiling.make_token()
+        )
+        saved = RequestProfile.objects.get()
+        self.client.force_login(self.admin)
+        response = self.client.get(
+            reverse('admin:posts_requestprofile_changelist')
+        )
+        self.assertContains(response, saved.path)
+        response = self.client.get(
+            reverse('admin:posts_requestprofile_change', args=[saved.pk])
+        )
+        self.assertContains(response, 'cumulative')
+        response = self.client.post(
+            reverse('admin:posts_requestprofile_changelist'),
+            {'action': 'download_stats', '_selected_action': [saved.pk]},
+        )
+        self.assertEqual(bytes(saved.stats), response.content)
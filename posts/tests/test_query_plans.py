@@ -0,0 +1,81 @@
+import re
+
+from django.db import IntegrityError, connection
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+from posts.pagination import CursorPaginator, POSTS_PER_PAGE
+
+
+# полный проход таблицы: SCAN без индекса или отдельная сортировка
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$|^SCAN (TABLE )?\w+ AS \w+$')
+SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+class FeedQueryPlanTests(TestCase):
+    """Каждая лента из posts/views.py читается по индексу"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group
+        )
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndexes(self, queryset):
+        plan = self.plan(queryset)
+        for detail in plan:
+            self.assertIsNone(
+                FULL_SCAN.match(detail), f'полный проход: {plan}'
+            )
+            self.assertNotIn(SORT, detail, f'сортировка без индекса: {plan}')
+
+    def feeds(self):
+        posts = Post.objects.select_related('author', 'group')
+        return {
+            'index': posts,
+            'group': self.group.posts.select_related('author', 'group'),
+            'profile': self.author.posts.select_related('author', 'group'),
+            'follow': TimelineEntry.objects.filter(user=self.user)
+            .select_related('post__author', 'post__group'),
+        }
+
+    def test_first_pages(self):
+        for name, queryset in self.feeds().items():
+            with self.subTest(feed=name):
+                queryset = queryset.order_by('-pub_date', '-pk')
+                self.assertUsesIndexes(queryset[:POSTS_PER_PAGE + 1])
+
+    def test_cursor_pages(self):
+        cursor = (self.post.pub_date, self.post.pk)
+        for name, queryset in self.feeds().items():
+            with self.subTest(feed=name):
+                paginator = CursorPaginator(queryset, POSTS_PER_PAGE)
+                for forward in (True, False):
+                    self.assertUsesIndexes(
+                        paginator.page_query(cursor, forward)
+                    )
+
+    def test_post_page(self):
+        self.assertUsesIndexes(Comment.objects.filter(post=self.post))
+        self.assertUsesIndexes(
+            Follow.objects.filter(user=self.user, author=self.author)
+        )
+
+
+class FollowConstraintTests(TestCase):
+
+    def test_follow_is_unique(self):
+        user = User.objects.create(username='reader')
+        author = User.objects.create(username='author')
+        Follow.objects.create(user=user, author=author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=user, author=author)
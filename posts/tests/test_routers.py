@@ -0,0 +1,107 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+
+from posts import routers, stats
+from posts.models import Post, User, UserStats
+
+
+@mock.patch('posts.routers.replica_aliases', return_value=['replica'])
+class RouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+
+    def test_reads_primary_outside_request(self, aliases):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_reads_replica_until_write(self, aliases):
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaAliasesTests(SimpleTestCase):
+
+    def test_missing_replica_file_reads_primary(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'replica.sqlite3')
+        with mock.patch.dict(
+            connections['replica'].settings_dict, {'NAME': path}
+        ):
+            self.assertEqual(routers.replica_aliases(), [])
+            sqlite3.connect(path).close()
+            self.assertEqual(routers.replica_aliases(), ['replica'])
+
+
+class StickinessTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.client.force_login(self.user)
+
+    def test_read_does_not_pin(self):
+        response = self.client.get(reverse('index'))
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_write_pins_to_primary(self):
+        """После записи (даже GET-подписки) браузер читает основную базу"""
+        response = self.client.get(
+            reverse('profile_follow', kwargs={'username': 'author'})
+        )
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        with mock.patch(
+            'posts.routers.replica_reads', wraps=routers.replica_reads
+        ) as replica_reads:
+            self.client.get(reverse('index'))
+        replica_reads.assert_called_once_with(False)
+
+
+class StatsOnReplicaTests(TestCase):
+
+    def test_rebuild_reads_primary(self):
+        """Пересчёт статистики не читает отставшие данные с реплики"""
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=author)
+        UserStats.objects.filter(pk=author.pk).delete()
+        with mock.patch.object(
+            routers.PrimaryReplicaRouter, 'db_for_read',
+            autospec=True, return_value=None,
+        ) as db_for_read:
+            rebuilt = stats.get_stats(author)
+        self.assertEqual(rebuilt.posts, 1)
+        # через роутер (и значит, возможно, с реплики) идёт только
+        # первое чтение строки статистики
+        read = [call[0][1] for call in db_for_read.call_args_list]
+        self.assertEqual(read, [UserStats])
+
+
+class ReplicateTests(TransactionTestCase):
+
+    def test_copies_primary(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        target = os.path.join(directory, 'replica.sqlite3')
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=author)
+        call_command('replicate_db', target=[target], stdout=StringIO())
+        with sqlite3.connect(target) as replica:
+            rows = replica.execute('SELECT text FROM posts_post').fetchall()
+        self.assertEqual(rows, [('Пост',)])
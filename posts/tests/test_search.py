@@ -0,0 +1,80 @@
+from io import StringIO
+
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post, User
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        self.client = Client()
+
+    def test_search_finds_posts(self):
+        """Поиск находит пост по слову и учитывает правки и удаление"""
+        post = Post.objects.create(text='Котики гуляют по крыше', author=self.author)
+        Post.objects.create(text='Собаки спят', author=self.author)
+        response = self.client.get(reverse('search'), {'q': 'котик'})
+        self.assertEqual(list(response.context['page']), [post])
+        post.text = 'Теперь тут про погоду'
+        post.save()
+        response = self.client.get(reverse('search'), {'q': 'котик'})
+        self.assertEqual(len(response.context['page']), 0)
+        response = self.client.get(reverse('search'), {'q': 'погод'})
+        self.assertEqual(list(response.context['page']), [post])
+        post.delete()
+        response = self.client.get(reverse('search'), {'q': 'погод'})
+        self.assertEqual(len(response.context['page']), 0)
+
+    def test_search_syntax_is_escaped(self):
+        response = self.client.get(reverse('search'), {'q': '"OR ( NEAR'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_cursor_pagination(self):
+        for number in range(15):
+            Post.objects.create(text=f'Пирог номер {number}', author=self.author)
+        first = self.client.get(reverse('search'), {'q': 'пирог'})
+        page = first.context['page']
+        self.assertEqual(len(page), 10)
+        self.assertContains(first, 'q=%D0%BF%D0%B8%D1%80%D0%BE%D0%B3&amp;after=')
+        second = self.client.get(
+            reverse('search'), {'q': 'пирог', 'after': page.next_cursor}
+        )
+        found = [post.pk for post in page] + [
+            post.pk for post in second.context['page']
+        ]
+        self.assertEqual(sorted(found), sorted(
+            Post.objects.values_list('pk', flat=True)
+        ))
+
+    def test_admin_search_uses_index(self):
+        post = Post.objects.create(text='Редкое слово', author=self.author)
+        Comment.objects.create(post=post, author=self.author, text='Ответ')
+        request = RequestFactory().get('/')
+        for model, term in ((Post, 'редкое'), (Comment, 'ответ')):
+            with self.subTest(model=model.__name__):
+                model_admin = site._registry[model]
+                queryset, _ = model_admin.get_search_results(
+                    request, model.objects.all(), term
+                )
+                self.assertEqual(queryset.count(), 1)
+                self.assertIn('_fts', str(queryset.query))
+
+    def test_rebuild_command(self):
+        post = Post.objects.create(text='Восстановить', author=self.author)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('delete-all')"
+            )
+        queryset = search.filter_queryset(Post.objects.all(), 'восстановить')
+        self.assertFalse(queryset.exists())
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(list(queryset.all()), [post])
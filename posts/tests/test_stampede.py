@@ -0,0 +1,101 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from posts import stampede
+
+
+class StampedeTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+
+    def build(self, value='новое', delay=0):
+        def build():
+            self.builds += 1
+            time.sleep(delay)
+            return value
+        return build
+
+    def test_fresh_value_is_not_rebuilt(self):
+        stampede.get_or_build(cache, 'key', self.build('старое'), 60)
+        value = stampede.get_or_build(cache, 'key', self.build(), 60)
+        self.assertEqual(value, 'старое')
+        self.assertEqual(self.builds, 1)
+
+    def test_stale_served_while_locked(self):
+        """Пока ключ пересобирает другой запрос, отдаётся старое значение"""
+        stampede.write(cache, 'key', 'старое', 0, 0.01)
+        self.assertTrue(stampede._lock(cache, 'key'))
+        value = stampede.get_or_build(cache, 'key', self.build(), 60)
+        self.assertEqual(value, 'старое')
+        self.assertEqual(self.builds, 0)
+
+    def test_stale_rebuilt_by_lock_holder(self):
+        stampede.write(cache, 'key', 'старое', 0, 0.01)
+        value = stampede.get_or_build(cache, 'key', self.build(), 60)
+        self.assertEqual(value, 'новое')
+        # блокировка снята, значение снова свежее
+        self.assertTrue(stampede._lock(cache, 'key'))
+        self.assertEqual(stampede.read(cache, 'key').value, 'новое')
+
+    def test_early_refresh(self):
+        """Горячий ключ с долгой сборкой пересобирается до срока"""
+        stampede.write(cache, 'key', 'старое', 5, 10)
+        with mock.patch('posts.stampede.random.random', return_value=0.0):
+            self.assertFalse(stampede.read(cache, 'key').rebuild)
+        with mock.patch('posts.stampede.random.random', return_value=0.999):
+            self.assertTrue(stampede.read(cache, 'key').rebuild)
+
+    def test_failed_build_releases_lock(self):
+        def broken():
+            raise RuntimeError
+        with self.assertRaises(RuntimeError):
+            stampede.get_or_build(cache, 'key', broken, 60)
+        self.assertTrue(stampede._lock(cache, 'key'))
+
+    def test_concurrent_miss_builds_once(self):
+        """Одновременные промахи собирают значение один раз"""
+        results = []
+
+        def request():
+            results.append(stampede.get_or_build(
+                cache, 'key', self.build(delay=0.2), 60
+            ))
+
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['новое'] * 4)
+        self.assertEqual(self.builds, 1)
+
+    @override_settings(CACHE_LOCK_WAIT=0.1)
+    def test_miss_builds_after_wait(self):
+        self.assertTrue(stampede._lock(cache, 'key'))
+        value = stampede.get_or_build(cache, 'key', self.build(), 60)
+        self.assertEqual(value, 'новое')
+        self.assertEqual(self.builds, 1)
+
+    def test_value_without_envelope_is_miss(self):
+        """Значение старого формата под тем же ключом пересобирается"""
+        cache.set('key', '<div>старая разметка</div>')
+        value = stampede.get_or_build(cache, 'key', self.build(), 60)
+        self.assertEqual(value, 'новое')
+        self.assertEqual(self.builds, 1)
+
+    def test_template_tag(self):
+        template = Template(
+            '{% load fragment_cache %}'
+            '{% cache 20 fragment name %}{{ value }}{% endcache %}'
+        )
+        first = template.render(Context({'name': 'a', 'value': 'один'}))
+        second = template.render(Context({'name': 'a', 'value': 'два'}))
+        other = template.render(Context({'name': 'b', 'value': 'три'}))
+        self.assertEqual((first, second, other), ('один', 'один', 'три'))
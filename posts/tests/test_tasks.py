@@ -0,0 +1,190 @@
+import datetime as dt
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import caching, queue
+from posts.models import Follow, Post, Task, TimelineEntry, User
+
+
+calls = []
+
+
+@queue.task(max_attempts=2, retry_delay=60)
+def record(value):
+    calls.append(value)
+
+
+@queue.task(max_attempts=2, retry_delay=60)
+def broken():
+    raise RuntimeError('сломано')
+
+
+@override_settings(TASKS_EAGER=False, TASK_SCHEDULE={})
+class QueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def run_workers(self):
+        call_command('run_workers', processes=0, burst=True)
+
+    def test_delay_and_run(self):
+        task = record.delay('значение')
+        self.assertEqual(task.name, 'posts.tests.test_tasks.record')
+        self.assertEqual(calls, [])
+        self.run_workers()
+        self.assertEqual(calls, ['значение'])
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.DONE, 1))
+
+    def test_retry_with_backoff(self):
+        task = broken.delay()
+        with self.assertLogs('posts.queue', 'WARNING'):
+            self.run_workers()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.QUEUED, 1))
+        self.assertIn('сломано', task.last_error)
+        delay = (task.run_at - timezone.now()).total_seconds()
+        self.assertTrue(50 < delay <= 66, delay)
+        self.assertAlmostEqual(queue.backoff(3, 10), 40, delta=4)
+
+        # срок повтора настал, вторая попытка последняя
+        Task.objects.filter(pk=task.pk).update(run_at=timezone.now())
+        with self.assertLogs('posts.queue', 'ERROR'):
+            self.run_workers()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        self.assertIsNotNone(task.finished)
+
+    def test_scheduled(self):
+        later = record.schedule(args=['потом'], countdown=60)
+        record.schedule(
+            args=['сейчас'], eta=timezone.now() - dt.timedelta(seconds=1)
+        )
+        self.run_workers()
+        self.assertEqual(calls, ['сейчас'])
+        later.refresh_from_db()
+        self.assertEqual(later.status, Task.QUEUED)
+
+    def test_claimed_once(self):
+        task = record.delay('один')
+        self.assertEqual(queue.claim('a').pk, task.pk)
+        self.assertIsNone(queue.claim('b'))
+
+    @override_settings(TASK_TIMEOUT=60)
+    def test_stale_requeued(self):
+        """Задача упавшего исполнителя возвращается в очередь"""
+        task = record.delay('один')
+        queue.claim('упавший')
+        Task.objects.filter(pk=task.pk).update(
+            locked_at=timezone.now() - dt.timedelta(minutes=5)
+        )
+        self.run_workers()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.DONE, 2))
+        self.assertEqual(calls, ['один'])
+
+    @override_settings(TASK_SCHEDULE={'posts.queue.purge': 60})
+    def test_periodic(self):
+        """Периодическая задача стоит в очереди в одном экземпляре"""
+        old = Task.objects.create(
+            name='posts.tests.test_tasks.record', payload='{}',
+            run_at=timezone.now(), max_attempts=1, status=Task.DONE,
+            finished=timezone.now() - dt.timedelta(days=2),
+        )
+        queue.schedule_periodic()
+        queue.schedule_periodic()
+        purge = Task.objects.get(name='posts.queue.purge')
+        self.assertEqual(purge.status, Task.QUEUED)
+        Task.objects.filter(pk=purge.pk).update(run_at=timezone.now())
+        self.run_workers()
+        self.assertFalse(Task.objects.filter(pk=old.pk).exists())
+        # следующий экземпляр ставится после выполнения прошлого
+        queue.schedule_periodic()
+        self.assertEqual(
+            Task.objects.filter(
+                name='posts.queue.purge', status=Task.QUEUED
+            ).count(),
+            1,
+        )
+
+
+@override_settings(TASKS_EAGER=False, TASK_SCHEDULE={})
+class SideEffectTaskTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        self.reader = User.objects.create(username='reader')
+
+    def run_workers(self):
+        call_command('run_workers', processes=0, burst=True)
+
+    def test_timeline_filled_by_worker(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.run_workers()
+        timeline = caching.scope_for_timeline(self.reader.pk)
+        before = caching.get_version(timeline)
+        post = Post.objects.create(text='Пост', author=self.author)
+        entries = TimelineEntry.objects.filter(user=self.reader)
+        self.assertFalse(entries.exists())
+        self.run_workers()
+        self.assertEqual(list(entries.values_list('post', flat=True)),
+                         [post.pk])
+        self.assertNotEqual(caching.get_version(timeline), before)
+
+    def test_delete_refreshes_timelines_in_background(self):
+        """Удаление поста не перебирает подписчиков в запросе"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.run_workers()
+        timeline = caching.scope_for_timeline(self.reader.pk)
+        before = caching.get_version(timeline)
+        post.delete()
+        self.assertEqual(caching.get_version(timeline), before)
+        self.run_workers()
+        self.assertNotEqual(caching.get_version(timeline), before)
+
+    def test_deleted_before_run(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        post.delete()
+        Follow.objects.all().delete()
+        self.run_workers()
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertFalse(Task.objects.exclude(status=Task.DONE).exists())
+
+    def test_welcome_email(self):
+        data = {
+            'username': 'newbie',
+            'email': 'newbie@example.com',
+            'password1': 'Sup3r-secret-pass',
+            'password2': 'Sup3r-secret-pass',
+        }
+        self.client.post(reverse('signup'), data)
+        self.assertEqual(len(mail.outbox), 0)
+        self.run_workers()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['newbie@example.com'])
+
+
+@override_settings(TASKS_EAGER=False, TASK_SCHEDULE={})
+class ThumbnailTaskTests(TransactionTestCase):
+
+    def test_thumbnails_task(self):
+        """Миниатюры ставятся в очередь после коммита поста"""
+        author = User.objects.create(username='author')
+        post = Post(text='Пост', author=author, image='posts/a.gif')
+        with mock.patch('posts.thumbnails.get_thumbnail') as get_thumbnail:
+            post.save()
+            get_thumbnail.assert_not_called()
+            call_command('run_workers', processes=0, burst=True)
+            get_thumbnail.assert_called_once_with(
+                'posts/a.gif', '960x339', crop='center', upscale=True
+            )
@@ -0,0 +1,52 @@
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry, User
+
+
+class TimelineTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.reader = User.objects.create(username='reader')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков автора"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        response = self.client.get(reverse('follow_index'))
+        self.assertEqual(list(response.context['page']), [post])
+
+    def test_follow_backfills_and_unfollow_cleans(self):
+        """Подписка добавляет старые посты автора, отписка их убирает"""
+        posts = [
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+            for number in range(3)
+        ]
+        self.client.get(
+            reverse('profile_follow', kwargs={'username': 'author'})
+        )
+        response = self.client.get(reverse('follow_index'))
+        self.assertEqual(list(response.context['page']), posts[::-1])
+        self.client.get(
+            reverse('profile_unfollow', kwargs={'username': 'author'})
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader).exists())
+
+    def test_follow_index_does_not_join_follow(self):
+        """Лента подписок читается из TimelineEntry без join по Follow"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(3):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('follow_index'))
+        self.assertFalse(
+            any('posts_follow' in query['sql'] for query in context)
+        )
@@ -1,9 +1,13 @@
 from django.core.cache import cache
+from django.db import connection
+from django.db.models import QuerySet
 from django.test import Client
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import  Comment, Follow, Group, Post, User
+from posts.pagination import COMMENTS_PER_PAGE
 
 
 class ViewsTests(TestCase):
@@ -169,6 +173,33 @@ class ViewsTests(TestCase):
         self.assertEqual(post.group, new_group)
         self.assertEqual(post.author.username, username)
 
+    def test_feed_queries_do_not_depend_on_posts(self):
+        """Число запросов ленты не растёт вместе с числом постов"""
+        author = User.objects.create(username='author')
+        group = self.new_group('group_1')
+        client = self.new_unauthorized_client()
+        urls = [
+            reverse('index'),
+            reverse('group', kwargs={'slug': group.slug}),
+            reverse('profile', kwargs={'username': author.username}),
+        ]
+        counts = {}
+        for posts_count in (1, 10):
+            Post.objects.all().delete()
+            for number in range(posts_count):
+                post = Post.objects.create(
+                    text=f'Пост {number}', author=author, group=group
+                )
+                Comment.objects.create(post=post, author=author, text='К')
+            for url in urls:
+                cache.clear()
+                with CaptureQueriesContext(connection) as context:
+                    client.get(url)
+                counts.setdefault(url, []).append(len(context))
+        for url, (few, many) in counts.items():
+            with self.subTest(url=url):
+                self.assertEqual(few, many)
+
     def test_404(self):
         client = Client()
         response = client.get(reverse('response_404'))
@@ -287,3 +318,66 @@ class ViewsTests(TestCase):
             {'text': 'Новый комментарий'},
         )
         self.assertEqual(Comment.objects.count(), 0)
+
+
+class CommentPaginationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        self.post = Post.objects.create(text='Пост', author=self.author)
+        self.url = reverse(
+            'post',
+            kwargs={'username': 'author', 'post_id': self.post.pk},
+        )
+        self.fragment_url = reverse(
+            'post_comments',
+            kwargs={'username': 'author', 'post_id': self.post.pk},
+        )
+
+    def add_comments(self, total):
+        for number in range(total):
+            Comment.objects.create(
+                post=self.post, author=self.author,
+                text=f'Комментарий {number}',
+            )
+
+    def test_first_page_and_fragment(self):
+        """Пост показывает первую порцию, фрагмент отдаёт следующую"""
+        self.add_comments(COMMENTS_PER_PAGE + 5)
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context['comments']), COMMENTS_PER_PAGE)
+        self.assertIsNotNone(response.context['comments_next'])
+        fragment = self.client.get(
+            self.fragment_url, {'after': response.context['comments_next']}
+        )
+        self.assertEqual(
+            [item.text for item in fragment.context['comments']],
+            [f'Комментарий {number}' for number in range(20, 25)],
+        )
+        self.assertNotContains(fragment, '<html')
+        self.assertIsNone(fragment.context['comments_next'])
+
+    def test_full_last_page(self):
+        """Ровно порция комментариев: курсора дальше нет, запрос один"""
+        self.add_comments(COMMENTS_PER_PAGE)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.fragment_url)
+        comments = response.context['comments']
+        self.assertIsInstance(comments, QuerySet)
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertIsNone(response.context['comments_next'])
+        self.assertEqual(
+            sum('posts_comment' in query['sql'] for query in context), 1
+        )
+
+    def test_queries_do_not_depend_on_comments(self):
+        counts = []
+        for total in (COMMENTS_PER_PAGE + 1, COMMENTS_PER_PAGE * 3):
+            Comment.objects.all().delete()
+            self.add_comments(total)
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(self.url)
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
@@ -0,0 +1,32 @@
+import logging
+
+from django.conf import settings
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from .queue import task
+
+
+logger = logging.getLogger(__name__)
+
+
+@task
+def generate(name, variants=None):
+    """Создаёт все варианты миниатюр картинки и кладёт их в KV-хранилище."""
+    if variants is None:
+        variants = settings.POST_THUMBNAIL_VARIANTS
+    for geometry, options in variants:
+        try:
+            get_thumbnail(name, geometry, **options)
+        except Exception:
+            logger.exception('Не удалось создать миниатюру %s %s', name, geometry)
+
+
+def prefetch(posts):
+    """Подгружает миниатюры всех постов страницы двумя пакетами."""
+    kvstore = default.kvstore
+    if not hasattr(kvstore, 'prefetch_thumbnails'):
+        return
+    sources = [ImageFile(post.image.name) for post in posts if post.image]
+    if sources:
+        kvstore.prefetch_thumbnails(sources)
@@ -0,0 +1,137 @@
+from collections import defaultdict
+from itertools import islice
+
+from django.db import connection
+
+from . import caching
+from .models import Follow, Post, TimelineEntry
+from .queue import task
+
+
+BATCH_SIZE = 500
+
+
+def _bulk_insert(entries):
+    # bulk_create превращает аргумент в список, поэтому режем поток
+    # на пачки сами и не держим в памяти всех подписчиков сразу
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            break
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты всех подписчиков автора."""
+    fan_out_many([post])
+
+
+@task
+def fan_out_post(post_id):
+    """Фоновая раскладка нового поста по лентам подписчиков.
+
+    Версии лент меняются после вставки: иначе закэшированная до неё
+    лента осталась бы без поста.
+    """
+    post = Post.objects.filter(pk=post_id).only(
+        'pk', 'author_id', 'pub_date'
+    ).first()
+    if post is None:
+        # пост удалили раньше, чем до него дошла очередь
+        return
+    fan_out(post)
+    refresh_followers(post.author_id)
+
+
+@task
+def refresh_followers(author_id):
+    """Меняет версии лент всех подписчиков автора.
+
+    По записи в кэш на подписчика, поэтому вне запроса: после удаления
+    поста и из fan_out_post.
+    """
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    caching.bump(*(
+        caching.scope_for_timeline(user_id)
+        for user_id in followers.iterator()
+    ))
+
+
+def fan_out_many(posts):
+    """Раскладывает пачку постов по лентам подписчиков их авторов."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    followers = Follow.objects.filter(
+        author_id__in=list(by_author)
+    ).values_list('author_id', 'user_id')
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=author_id,
+            pub_date=post.pub_date,
+        )
+        for author_id, user_id in followers.iterator()
+        for post in by_author[author_id]
+    )
+
+
+def fan_out_since(post_id):
+    """Раскладывает посты с pk >= post_id одним INSERT ... SELECT.
+
+    Для массовой загрузки: база соединяет посты с подписками сама, без
+    передачи миллионов строк через Python.
+    """
+    entry, post, follow = (
+        model._meta.db_table for model in (TimelineEntry, Post, Follow)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {entry} (user_id, post_id, author_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            f'FROM {post} p JOIN {follow} f ON f.author_id = p.author_id '
+            f'WHERE p.id >= %s',
+            [post_id],
+        )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    _backfill(user_id, author_id, Post.objects.filter(author_id=author_id))
+
+
+def _backfill(user_id, author_id, posts):
+    _bulk_insert(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts.values_list(
+                'pk', 'pub_date'
+            ).iterator()
+        )
+    )
+
+
+@task
+def backfill_follow(user_id, author_id):
+    """Фоновое заполнение ленты после подписки."""
+    # соединение с подпиской: если от автора успели отписаться, постов
+    # не найдётся
+    posts = Post.objects.filter(
+        author_id=author_id, author__following__user_id=user_id
+    )
+    _backfill(user_id, author_id, posts)
+    caching.bump(caching.scope_for_timeline(user_id))
+
+
+def remove(user_id, author_id):
+    """Убирает посты автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
@@ -16,12 +16,18 @@ urlpatterns = [
     path("new/", 
          views.new_post, 
          name="new_post"),
+    path("search/", 
+         views.search_posts, 
+         name="search"),
     path("<str:username>/", 
          views.profile, 
          name="profile"),
     path("<str:username>/<int:post_id>/", 
          views.post_view, 
          name="post"),
+    path("<str:username>/<int:post_id>/comments/", 
+         views.post_comments, 
+         name="post_comments"),
     path("<username>/<int:post_id>/comment", 
          views.add_comment, 
          name="add_comment"), 
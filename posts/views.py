@@ -1,33 +1,41 @@
-from django.core.cache import cache
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import condition
 
+from . import caching, conditional, counts, search, thumbnails
+from .stats import get_stats
 from .forms import CommentForm, PostForm
-from .models import Group, Post, User, Follow
+from .models import Group, Post, User, Follow, TimelineEntry
+from .pagination import (
+    COMMENTS_PER_PAGE, POSTS_PER_PAGE, CursorPaginator, decode_cursor,
+    paginate,
+)
 
 
+@condition(etag_func=conditional.index_etag)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group')
+    paginator, page = paginate(request, post_list, count=counts.index)
+    thumbnails.prefetch(page)
     return render(
         request,
         "index.html",
         {
             'page': page, 
-            'paginator': paginator
+            'paginator': paginator,
+            'cache_version': caching.get_version(caching.scope_for_index()),
         }
     )
 
 
+@condition(etag_func=conditional.group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = group.posts.select_related('author', 'group')
+    paginator, page = paginate(
+        request, posts, count=lambda: counts.group(group.pk)
+    )
+    thumbnails.prefetch(page)
     return render(
         request, 
         "group.html", 
@@ -35,7 +43,35 @@ def group_posts(request, slug):
             'group': group,
             'posts': posts,
             'page': page, 
-            'paginator': paginator
+            'paginator': paginator,
+            'cache_version': caching.get_version(
+                caching.scope_for_group(group.pk)
+            ),
+        },
+    )
+
+
+def search_posts(request):
+    query = request.GET.get('q', '')
+    posts = Post.objects.select_related('author', 'group')
+    if search.is_available():
+        paginator = search.SearchPaginator(posts, query, POSTS_PER_PAGE)
+        page = paginator.get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    else:
+        paginator, page = paginate(
+            request, search.filter_queryset(posts, query)
+        )
+    thumbnails.prefetch(page)
+    return render(
+        request,
+        'search.html',
+        {
+            'query': query,
+            'page': page,
+            'paginator': paginator,
         },
     )
 
@@ -48,25 +84,32 @@ def new_post(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
-    cache.clear()
     return redirect('index')
 
 
+@condition(etag_func=conditional.profile_etag)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
+    post_list = author.posts.select_related('author', 'group')
     following = (
         request.user.is_authenticated and 
         author.following.filter(user=request.user).exists()
     )
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    # число постов автора уже есть в его счётчиках
+    stats = get_stats(author)
+    paginator, page = paginate(
+        request, post_list, count=lambda: stats.posts
+    )
+    thumbnails.prefetch(page)
     context = {
         'page': page,
         'paginator' : paginator,
         'author': author,
+        'stats': stats,
         'following': following,
+        'cache_version': caching.get_version(
+            caching.scope_for_profile(author.pk)
+        ),
     }    
     return render(
         request, 
@@ -75,16 +118,24 @@ def profile(request, username):
     )
  
  
+@condition(etag_func=conditional.post_etag)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'),
+        author__username=username,
+        pk=post_id,
+    )
     author = post.author
     form = CommentForm()
-    comments = post.comments.all()
+    comments, comments_next = _comments(request, post)
     context = {
         'post': post,
         'author':author,
+        'stats': get_stats(author),
         'form': form,
         'comments': comments,
+        'comments_next': comments_next,
+        'cache_version': caching.get_version(caching.scope_for_post(post.pk)),
     }
     return render(
         request, 
@@ -93,6 +144,50 @@ def post_view(request, username, post_id):
     )
 
 
+def _comments(request, post):
+    """Порция комментариев после курсора ?after= и курсор следующей.
+
+    Порция остаётся QuerySet, как в контексте страницы поста раньше.
+    Запрос один, на COMMENTS_PER_PAGE + 1 строк: лишняя строка говорит,
+    что дальше есть ещё комментарии, а в кэш порции, как это делает
+    prefetch_related в Django, кладутся только первые строки, и шаблон
+    запрос не повторяет.
+    """
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_PER_PAGE,
+        field='created',
+        descending=False,
+    )
+    cursor = decode_cursor(request.GET.get('after'))
+    query = paginator.page_query(cursor, forward=True)
+    comments = query[:COMMENTS_PER_PAGE]
+    batch = list(query)
+    comments._result_cache = batch[:COMMENTS_PER_PAGE]
+    next_cursor = None
+    if len(batch) > COMMENTS_PER_PAGE:
+        next_cursor = paginator.cursor_for(batch[COMMENTS_PER_PAGE - 1])
+    return comments, next_cursor
+
+
+@condition(etag_func=conditional.post_etag)
+def post_comments(request, username, post_id):
+    """Следующая порция комментариев без страницы поста вокруг неё."""
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        author__username=username,
+        pk=post_id,
+    )
+    comments, comments_next = _comments(request, post)
+    context = {
+        'post': post,
+        'comments': comments,
+        'comments_next': comments_next,
+        'cache_version': caching.get_version(caching.scope_for_post(post.pk)),
+    }
+    return render(request, 'comment_list.html', context)
+
+
 @login_required
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, pk=post_id)
@@ -104,7 +199,11 @@ def post_edit(request, username, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        # comment_count меняется в обход формы, не затираем его;
+        # modified сохраняем явно, иначе карточка поста не обновится
+        form.save(commit=False).save(
+            update_fields=[*form.Meta.fields, 'modified']
+        )
         return redirect('post', username=username, post_id=post_id)
     return render(
         request,
@@ -148,12 +247,19 @@ def server_error(request):
 
 
 @login_required
+@condition(etag_func=conditional.follow_etag)
 def follow_index(request):
     # информация о текущем пользователе доступна в переменной request.user
-    following_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(following_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    following_list = TimelineEntry.objects.filter(
+        user=request.user
+    ).select_related('post__author', 'post__group')
+    paginator, page = paginate(
+        request,
+        following_list,
+        count=lambda: counts.timeline(request.user.pk),
+    )
+    page.object_list = [entry.post for entry in page.object_list]
+    thumbnails.prefetch(page)
     return render(
         request, 
         'follow.html', 
@@ -0,0 +1,44 @@
+"""Цикл исполнителя фоновых задач для run_workers.
+
+Модуль загружается в spawn-процессе до django.setup(), поэтому модели
+(и posts.queue) импортируются только внутри функций.
+"""
+import os
+import signal
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+def _init_worker(settings_module):
+    # spawn-процесс стартует с чистым интерпретатором
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def work(worker, stop, burst, idle=None):
+    """Берёт готовые задачи, пока не выставлен stop.
+
+    С burst выходит, когда готовых задач нет; иначе ждёт
+    TASK_POLL_INTERVAL, перед этим вызывая idle.
+    """
+    from . import queue
+    while not stop.is_set():
+        close_old_connections()
+        if queue.run_next(worker):
+            continue
+        if burst:
+            return
+        if idle is not None:
+            idle()
+        stop.wait(settings.TASK_POLL_INTERVAL)
+
+
+def run(settings_module, worker, stop, burst):
+    """Точка входа процесса-исполнителя."""
+    _init_worker(settings_module)
+    # остановку ведёт управляющий процесс через stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    work(worker, stop, burst)
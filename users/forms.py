@@ -1,13 +1,43 @@
+from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
+from django.urls import get_resolver
 
 
 User = get_user_model()
 
 
+def reserved_usernames(patterns=None):
+    """Первые сегменты адресов сайта: /search/, /new/, /auth/ и т. п.
+
+    Адрес профиля — /<username>/, и пользователь с таким именем не
+    открыл бы свою страницу: её перехватил бы маршрут раньше в списке.
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    names = set()
+    for pattern in patterns:
+        route = str(pattern.pattern).lstrip('^')
+        if not route and hasattr(pattern, 'url_patterns'):
+            names |= reserved_usernames(pattern.url_patterns)
+            continue
+        segment = route.split('/')[0]
+        if segment and not any(char in segment for char in '<(?[\\$'):
+            names.add(segment)
+    return names
+
+
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
 
         model = User
 
-        fields = ("first_name", "last_name", "username", "email")
\ No newline at end of file
+        fields = ("first_name", "last_name", "username", "email")
+
+    def clean_username(self):
+        username = self.cleaned_data['username']
+        if username in reserved_usernames():
+            raise forms.ValidationError(
+                'Это имя занято адресом сайта, выберите другое.'
+            )
+        return username
@@ -4,6 +4,7 @@ from django.views.generic import CreateView
 
 from django.urls import reverse_lazy
 
+from .emails import send_welcome
 from .forms import CreationForm
 
 
@@ -11,3 +12,8 @@ class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy("login") #  где login — это параметр "name" в path()
     template_name = "signup.html"
+
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        send_welcome.delay(self.object.pk)
+        return response
@@ -38,12 +38,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'posts.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -52,7 +56,8 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени отрисовки для метрик запроса
+        'BACKEND': 'posts.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -77,7 +82,82 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # в рабочем режиме соединение переживает запрос и не открывается
+        # заново на каждый из них
+        'CONN_MAX_AGE': 0 if DEBUG else 600,
+    },
+    # копия основной базы только для чтения, её обновляет replicate_db
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+        'CONN_MAX_AGE': 0 if DEBUG else 600,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['posts.routers.PrimaryReplicaRouter']
+# Реплики включаются явно, псевдонимами через запятую в переменной
+# окружения YATUBE_REPLICAS (YATUBE_REPLICAS=replica), и только вместе с
+# постоянно работающим replicate_db --interval; REPLICA_PIN_SECONDS должен
+# быть больше его интервала. Без переменной всё читается из основной базы
+DATABASE_REPLICAS = [
+    alias.strip()
+    for alias in os.environ.get('YATUBE_REPLICAS', '').split(',')
+    if alias.strip()
+]
+REPLICA_PIN_COOKIE = 'primary_pin'
+REPLICA_PIN_SECONDS = 15
+
+# Как часто сводка метрик запросов пишется в лог posts.metrics (вне DEBUG)
+METRICS_INTERVAL = 60
+
+# профилирование запросов, см. posts.profiling: доля случайно выбранных
+# запросов, срок жизни токена X-Profile и сколько профилей хранить
+PROFILE_SAMPLE_RATE = 0
+PROFILE_TOKEN_MAX_AGE = 60 * 60
+PROFILE_KEEP = 200
+
+# Фоновые задачи, см. posts.queue и run_workers. TASKS_EAGER — выполнять
+# задачи сразу при постановке (разработка и тесты), иначе их выполняют
+# TASK_WORKERS процессов run_workers, опрашивая очередь раз в
+# TASK_POLL_INTERVAL секунд. Задача, которая выполняется дольше
+# TASK_TIMEOUT, возвращается в очередь; после ошибки она повторяется
+# через TASK_RETRY_DELAY * 2^(попытка - 1) секунд, всего до
+# TASK_MAX_ATTEMPTS попыток. Выполненные задачи хранятся TASK_KEEP_DONE
+# секунд. TASK_SCHEDULE — периодические задачи: путь и интервал
+TASKS_EAGER = DEBUG
+TASK_WORKERS = 2
+TASK_POLL_INTERVAL = 1.0
+TASK_TIMEOUT = 5 * 60
+TASK_RETRY_DELAY = 10
+TASK_MAX_ATTEMPTS = 5
+TASK_KEEP_DONE = 24 * 60 * 60
+TASK_SCHEDULE = {
+    'posts.queue.purge': 60 * 60,
+    'posts.search.optimize': 60 * 60,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'posts.metrics': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Прагмы ставятся на каждое новое соединение (posts/db.py). WAL не даёт
+# записи блокировать читателей, synchronous=normal в WAL безопасен при
+# падении процесса, cache_size в КиБ со знаком минус, mmap_size в байтах
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'memory',
 }
 
 
@@ -132,8 +212,47 @@ SITE_ID = 1
 LOGIN_REDIRECT_URL = '/'
 LOGIN_URL = '/auth/login/'
 
+# Двухуровневый кэш: LRU в памяти процесса перед общим для всех процессов
+# файлом SQLite. Изменения ключей рассылаются через журнал в том же файле,
+# другие процессы видят их не позже чем через SYNC_INTERVAL секунд
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'posts.cache_backends.TwoTierCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+            'SYNC_INTERVAL': 0.05,
+        },
     }
 }
+
+# manage.py test держит кэш и загрузки во временном каталоге; pytest
+# делает то же фикстурой в conftest.py
+TEST_RUNNER = 'posts.testing.IsolatedStorageRunner'
+
+# Миниатюры картинок постов создаются задачей после сохранения, а не при
+# первом показе. Варианты должны совпадать с тегом thumbnail в post_item.html
+POST_THUMBNAIL_VARIANTS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+
+# KV-хранилище миниатюр с LRU в памяти процесса и пакетной подгрузкой
+# записей для страницы ленты
+THUMBNAIL_KVSTORE = 'posts.kvstore.PrefetchingKVStore'
+THUMBNAIL_LRU_SIZE = 5000
+THUMBNAIL_LRU_TIMEOUT = 300
+
+# Время жизни страниц в кэше для анонимных посетителей; устаревание
+# определяют версии областей кэша, так что срок может быть долгим
+PAGE_CACHE_TIMEOUT = 600
+
+# Защита от набега на кэш (posts.stampede): сколько секунд после срока
+# отдавать старое значение, пока один запрос пересобирает ключ, на
+# сколько берётся блокировка пересборки, сколько ждать чужой сборки при
+# пустом кэше и насколько охотно пересобирать горячие ключи заранее
+CACHE_STALE_GRACE = 60
+CACHE_LOCK_TIMEOUT = 10
+CACHE_LOCK_WAIT = 1.0
+CACHE_EARLY_REFRESH_BETA = 1.0